@@ -1,6 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { ArrowRight, Rocket } from "lucide-react";
-import axios from 'axios';
 import { useTheme } from '../context/ThemeContext';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
@@ -56,6 +55,7 @@ const Chat = () => {
     const [isLoading, setIsLoading] = useState(false);
     const [showDetails, setShowDetails] = useState({});  // Track which messages show details
     const messagesEndRef = useRef(null);
+    const sessionIdRef = useRef(null);
     const { theme } = useTheme();
 
     const scrollToBottom = () => {
@@ -80,24 +80,64 @@ const Chat = () => {
         setInputText('');
         setIsLoading(true);
 
+        const newMessageId = Date.now();
+        let started = false;
+
+        const appendDelta = (delta) => {
+            if (!started) {
+                started = true;
+                setIsLoading(false);
+                setShowDetails(prev => ({ ...prev, [newMessageId]: false }));
+                setMessages(prev => [...prev, {
+                    id: newMessageId,
+                    type: 'ai',
+                    content: delta,
+                    insights: {},
+                    references: [],
+                    avatar: "/logo.png"
+                }]);
+                return;
+            }
+            setMessages(prev => prev.map(message =>
+                message.id === newMessageId
+                    ? { ...message, content: message.content + delta }
+                    : message
+            ));
+        };
+
         try {
-            const aiResponse = await axios.post(`${URL}/chat`, {
-                message: inputText
+            const response = await fetch(`${URL}/chat/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ message: inputText, session_id: sessionIdRef.current })
             });
+            if (!response.ok || !response.body) {
+                throw new Error(`Chat request failed with status ${response.status}`);
+            }
 
-            const newMessageId = Date.now();
-            setShowDetails(prev => ({ ...prev, [newMessageId]: false }));
+            // Parse the server-sent events as they arrive
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
 
-            const newAiMessage = {
-                id: newMessageId,
-                type: 'ai',
-                content: aiResponse.data.response || "No response available",
-                insights: aiResponse.data.insights || {},
-                references: Array.isArray(aiResponse.data.references) ? aiResponse.data.references : [],
-                avatar: "/logo.png"
-            };
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const rawEvent of events) {
+                    const lines = rawEvent.split('\n');
+                    const event = lines.find(line => line.startsWith('event: '))?.slice(7);
+                    const data = lines.find(line => line.startsWith('data: '))?.slice(6);
+                    const payload = data ? JSON.parse(data) : {};
+                    if (event === 'error') throw new Error(payload.message);
+                    if (event === 'done' && payload.session_id) sessionIdRef.current = payload.session_id;
+                    if (payload.delta) appendDelta(payload.delta);
+                }
+            }
 
-            setMessages(prev => [...prev, newAiMessage]);
+            if (!started) appendDelta("No response available");
         } catch (error) {
             console.error('Chat error:', error);
             const errorMessage = {
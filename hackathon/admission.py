@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+class Rejected(Exception):
+    """A request turned away by admission control"""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+class AdmissionLane:
+    """Bounded concurrency with a bounded FIFO queue in front of it.
+
+    Requests beyond max_concurrency wait in the queue; when the queue is full
+    they are rejected at once with 429, and requests that wait longer than
+    queue_timeout get 503. Both carry a Retry-After estimated from the
+    recent service time.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.queue_wait_seconds = 0.0
+        self.service_seconds = 0.0
+        self.completed = 0
+        self._avg_service = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        backlog = (len(self._waiters) + 1) / max(self.max_concurrency, 1)
+        return max(1, math.ceil(backlog * self._avg_service))
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the seconds spent queued"""
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise Rejected(429, self.retry_after(), f"{self.name} queue is full")
+
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait timed out
+                pass
+            else:
+                self.rejected_timeout += 1
+                raise Rejected(503, self.retry_after(), f"{self.name} queue wait exceeded {self.queue_timeout:g}s")
+        except BaseException:
+            # Cancelled (e.g. client gone) after release() handed us the slot:
+            # pass it on, or the lane loses that capacity for good
+            if waiter.done() and not waiter.cancelled():
+                self._hand_off()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.queue_wait_seconds += waited
+        return waited
+
+    def release(self, service_seconds: float):
+        self.completed += 1
+        self.service_seconds += service_seconds
+        self._avg_service = 0.8 * self._avg_service + 0.2 * service_seconds
+        self._hand_off()
+
+    def _hand_off(self):
+        """Give a freed slot straight to the next live waiter, keeping FIFO order"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        admitted = self.admitted or 1
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+            "avg_queue_wait_ms": round(self.queue_wait_seconds / admitted * 1000, 1),
+            "avg_service_ms": round(self.service_seconds / completed * 1000, 1)
+        }
+
+class AdmissionMiddleware:
+    """Route requests into admission lanes by path.
+
+    Expensive analyses and cheap interactive traffic use separate lanes, so
+    chat and history never queue behind analyses. Paths without a lane pass
+    straight through. Admitted responses carry X-Queue-Wait-Ms and
+    X-Service-Time-Ms (time to the response headers).
+    """
+
+    def __init__(self, app, lanes: dict, routes: dict):
+        self.app = app
+        self.lanes = lanes
+        self.routes = routes
+
+    def lane_for(self, path: str):
+        for prefix, lane in self.routes.items():
+            if path == prefix or path.startswith(prefix + "/"):
+                return self.lanes[lane]
+        return None
+
+    async def reject(self, send, rejection: Rejected):
+        body = json.dumps({"detail": rejection.reason}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": rejection.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejection.retry_after).encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        lane = self.lane_for(scope.get("path", "")) if scope["type"] == "http" else None
+        if lane is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            waited = await lane.acquire()
+        except Rejected as rejection:
+            logger.warning("Rejected %s %s: %s", scope.get("method"), scope.get("path"), rejection.reason)
+            await self.reject(send, rejection)
+            return
+
+        start = time.monotonic()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Queue-Wait-Ms"] = f"{waited * 1000:.1f}"
+                headers["X-Service-Time-Ms"] = f"{(time.monotonic() - start) * 1000:.1f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            lane.release(time.monotonic() - start)
+
+# Lanes: analyses fan out to paid upstream APIs; interactive traffic is cheap
+admission_lanes = {
+    "analyze": AdmissionLane(
+        "analyze",
+        max_concurrency=int(os.getenv("ANALYZE_MAX_CONCURRENCY", "4")),
+        max_queue=int(os.getenv("ANALYZE_MAX_QUEUE", "16")),
+        queue_timeout=float(os.getenv("ANALYZE_QUEUE_TIMEOUT", "30"))
+    ),
+    "interactive": AdmissionLane(
+        "interactive",
+        max_concurrency=int(os.getenv("INTERACTIVE_MAX_CONCURRENCY", "64")),
+        max_queue=int(os.getenv("INTERACTIVE_MAX_QUEUE", "256")),
+        queue_timeout=float(os.getenv("INTERACTIVE_QUEUE_TIMEOUT", "10"))
+    ),
+}
+admission_routes = {"/analyze": "analyze", "/chat": "interactive", "/history": "interactive"}
@@ -0,0 +1,71 @@
+"""Measure the per-call cost of logging on the hot paths.
+
+Usage:
+    python bench_logging.py [--iterations 100000] 2>/dev/null
+
+(the queued INFO lines are written to stderr)
+
+Compares the old eager ``json.dumps(..., indent=2)`` debug dump with the
+level-gated, sampled ``log_payload`` helper and with plain INFO messages
+routed through the background queue handler.
+"""
+import argparse
+import json
+import logging
+import time
+
+from log_config import LazyJSON, configure_logging, log_payload
+
+def sample_document(rows: int = 52, keywords: int = 5) -> dict:
+    """A document shaped like a stored analysis"""
+    names = [f"keyword{i}" for i in range(keywords)]
+    return {
+        "query": " ".join(names),
+        "timestamp": "2025-01-19T05:59:00",
+        "analysis": {
+            "metadata": {"total_sources": 25, "key_topics": names},
+            "ai_insights": "## Section\n- insight line\n" * 200,
+            "trend_analysis": {
+                "google_trends": {
+                    "data": [{"date": f"2024-{i % 12 + 1:02d}-01", **{n: float(i) for n in names}} for i in range(rows)],
+                    "keywords": names
+                }
+            },
+            "competitor_analysis": [{"title": f"Competitor {i}", "summary": "text " * 30, "sentiment": 0.1} for i in range(5)]
+        }
+    }
+
+def per_call(func, iterations: int) -> float:
+    """Average nanoseconds per call"""
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter_ns() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    # Discard output so only the cost paid by the calling thread is measured
+    configure_logging(level="INFO", module_levels={"bench.discard": "CRITICAL"})
+    logger = logging.getLogger("bench")
+    discard = logging.getLogger("bench.discard")
+    doc = sample_document()
+
+    eager_iterations = max(args.iterations // 100, 1)
+    results = [
+        ("baseline (empty call)", per_call(lambda: None, args.iterations)),
+        ("eager json.dumps(indent=2) dump", per_call(lambda: json.dumps(doc, indent=2), eager_iterations)),
+        ("log_payload at INFO", per_call(lambda: log_payload(logger, "Data being inserted", doc), args.iterations)),
+        ("logger.debug(LazyJSON) at INFO", per_call(lambda: logger.debug("Data: %s", LazyJSON(doc)), args.iterations)),
+        ("logger.info message (filtered)", per_call(lambda: discard.info("Inserted %s", "id"), args.iterations)),
+        ("logger.info message (queued)", per_call(lambda: logger.info("Inserted %s", "id"), max(args.iterations // 10, 1))),
+    ]
+
+    print(f"{'case':<36}{'ns/call':>12}")
+    for name, nanoseconds in results:
+        print(f"{name:<36}{nanoseconds:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Check the Reddit and Quora collectors against a local stub server.
+
+Usage:
+    python bench_social.py [--posts-per-page 25] [--pages 4] [--latency 0.05]
+
+A throwaway HTTP server stands in for reddit.com's search.json listing and
+DuckDuckGo's HTML search, so pagination, early stopping and parsing can be
+checked (and timed) without touching the real sites. Prints the pages each
+collector requested, what it returned and how long it took.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from social_collectors import QuoraCollector, RedditCollector, engagement
+
+def reddit_page(keyword: str, page: int, size: int, pages: int) -> dict:
+    """A search.json listing whose scores fall page by page"""
+    children = [
+        {"data": {
+            "title": f"{keyword} question {page}-{i}",
+            "selftext": f"I have a problem with {keyword} number {i}",
+            "score": 400 // (page + 1) - i,
+            "num_comments": 10 * (pages - page),
+            "permalink": f"/r/test/comments/{page}_{i}/"
+        }}
+        for i in range(size)
+    ]
+    return {"data": {"children": children, "after": f"t3_{page + 1}" if page + 1 < pages else None}}
+
+def quora_page(keyword: str, offset: int, size: int) -> str:
+    """A DuckDuckGo HTML result page, with one non-Quora result mixed in"""
+    results = []
+    for i in range(size):
+        target = f"https://www.quora.com/{quote(keyword)}-{offset + i}"
+        results.append(
+            f'<a rel="nofollow" class="result__a" href="//duckduckgo.com/l/?uddg={quote(target, safe="")}">'
+            f"How do I choose {keyword} #{offset + i}?</a>"
+            f'<a class="result__snippet" href="#">People want <b>{keyword}</b> that works.</a>'
+        )
+    results.append('<a rel="nofollow" class="result__a" href="https://example.com/ad">Ad</a>')
+    return "<html><body>" + "".join(results) + "</body></html>"
+
+def make_handler(args, requests_seen: list):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *_):
+            pass
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            time.sleep(args.latency)
+            if url.path == "/search.json":
+                page = int(params.get("after", "t3_0")[3:])
+                requests_seen.append(("reddit", page))
+                body = json.dumps(reddit_page(params["q"], page, args.posts_per_page, args.pages)).encode()
+                content_type = "application/json"
+            else:
+                offset = int(params.get("s", 0))
+                requests_seen.append(("quora", offset))
+                keyword = params["q"].replace("site:quora.com ", "")
+                body = quora_page(keyword, offset, args.posts_per_page).encode()
+                content_type = "text/html"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return StubHandler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts-per-page", type=int, default=25)
+    parser.add_argument("--pages", type=int, default=4, help="pages the stub listing has")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per stub response")
+    args = parser.parse_args()
+
+    requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args, requests_seen))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    try:
+        cases = [
+            ("reddit (early stop)", RedditCollector(base_url=base, max_pages=args.pages, min_engagement=100)),
+            ("reddit (no early stop)", RedditCollector(base_url=base, max_pages=args.pages, min_engagement=10 ** 6)),
+            ("quora", QuoraCollector(search_url=f"{base}/html/", page_size=args.posts_per_page,
+                                     max_pages=args.pages, target=40)),
+        ]
+        for name, collector in cases:
+            requests_seen.clear()
+            start = time.perf_counter()
+            posts = collector.search("vegan snacks", timeout=10)
+            elapsed = time.perf_counter() - start
+            print(f"{name}: {len(posts)} posts from {len(requests_seen)} pages {sorted(p for _, p in requests_seen)} "
+                  f"in {elapsed * 1000:.0f} ms")
+            top = posts[0] if posts else {}
+            print(f"  top: {top.get('title')!r} upvotes={top.get('upvotes')} comments={top.get('comments')} "
+                  f"engagement={engagement(top) if top else None} url={top.get('url')}")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Measure how long it takes to import the server, broken down by module.
+
+Usage:
+    python bench_startup.py [--module server] [--top 20] [--warm]
+
+The import is run in a fresh interpreter with ``-X importtime`` so the numbers
+reflect a cold worker start. With ``--warm`` the background warm-up of the
+server's lazy components is timed as well.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def measure_imports(module: str):
+    """Return (wall seconds, [(self_us, cumulative_us, name)]) for importing module"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return wall, rows
+
+def by_package(rows):
+    """Sum self time per top-level package"""
+    totals = defaultdict(int)
+    for self_us, _, name in rows:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def measure_warmup(module: str):
+    """Time each registered warm-up component of module in a fresh interpreter"""
+    code = (
+        "import json, {m}; {m}.warmup.run(); print(json.dumps({m}.warmup.report()))"
+    ).format(m=module)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    return proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else proc.stderr.strip()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--warm", action="store_true", help="also time the lazy component warm-up")
+    args = parser.parse_args()
+
+    wall, rows = measure_imports(args.module)
+    total_us = sum(row[0] for row in rows)
+    print(f"import {args.module}: {wall:.3f}s wall, {total_us / 1e6:.3f}s in imports ({len(rows)} modules)\n")
+
+    print(f"{'package':<32}{'self ms':>10}{'share':>8}")
+    for name, self_us in by_package(rows)[:args.top]:
+        print(f"{name:<32}{self_us / 1000:>10.1f}{self_us / total_us:>8.1%}")
+
+    print(f"\n{'module':<48}{'cumulative ms':>14}")
+    for _, cumulative_us, name in sorted(rows, reverse=True, key=lambda row: row[1])[:args.top]:
+        print(f"{name:<48}{cumulative_us / 1000:>14.1f}")
+
+    if args.warm:
+        print(f"\nwarm-up: {measure_warmup(args.module)}")
+
+if __name__ == "__main__":
+    main()
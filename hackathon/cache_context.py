@@ -0,0 +1,6 @@
+import contextvars
+
+# Seconds before expiry within which cached entries count as due for refresh.
+# Set while a background refresh runs so per-keyword stage caches and the
+# trend store refetch entries that are about to expire instead of reusing them.
+refresh_margin = contextvars.ContextVar("refresh_margin", default=0.0)
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 2 ** 12
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "to", "of", "and", "or",
+    "in", "on", "for", "with", "what", "which", "how", "do", "does", "i", "me",
+    "my", "we", "our", "you", "your", "it", "its", "this", "that", "can", "should"
+}
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens with common stop words removed"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOP_WORDS]
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Embed text as an L2-normalised hashed term-frequency vector.
+
+    Unigrams and bigrams are hashed into a fixed number of buckets and weighted
+    with sublinear tf, which is cheap on CPU and needs no model download.
+    """
+    tokens = tokenize(text)
+    terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not terms:
+        return vector
+
+    indexes = np.fromiter((zlib.crc32(t.encode()) % dim for t in terms), dtype=np.int64, count=len(terms))
+    np.add.at(vector, indexes, 1.0)
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+def context_fingerprint(context: str) -> int:
+    """Stable 64-bit fingerprint of the context a question was answered against"""
+    return int.from_bytes(hashlib.sha1(context.encode()).digest()[:8], "big", signed=True)
+
+class SemanticCache:
+    """Nearest-neighbour cache of chat answers keyed by question similarity.
+
+    Entries live in a fixed-size ring buffer backed by a NumPy matrix, so a
+    lookup is a single matrix-vector product over the cached questions that
+    share the same context fingerprint.
+    """
+
+    def __init__(self, max_entries: int = 512, threshold: float = 0.9, dim: int = EMBEDDING_DIM):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._fingerprints = np.zeros(max_entries, dtype=np.int64)
+        self._answers = [None] * max_entries
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, question: str, fingerprint: int):
+        """Return the cached answer for a similar question, or None"""
+        vector = embed_text(question, self.dim)
+        with self._lock:
+            if self._size and vector.any():
+                scores = self._vectors[:self._size] @ vector
+                scores[self._fingerprints[:self._size] != fingerprint] = -1.0
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    return self._answers[best]
+            self.misses += 1
+            return None
+
+    def store(self, question: str, fingerprint: int, answer: str):
+        """Add an answer to the cache, overwriting the oldest entry when full"""
+        vector = embed_text(question, self.dim)
+        if not vector.any():
+            return
+        with self._lock:
+            slot = self._next
+            if self._size == self.max_entries:
+                self.evictions += 1
+            else:
+                self._size += 1
+            self._vectors[slot] = vector
+            self._fingerprints[slot] = fingerprint
+            self._answers[slot] = answer
+            self._next = (slot + 1) % self.max_entries
+
+    def invalidate(self, *_):
+        """Drop every cached answer (called whenever a new analysis is stored)"""
+        with self._lock:
+            self._size = 0
+            self._next = 0
+            self._answers = [None] * self.max_entries
+            self.invalidations += 1
+        logger.info("Chat cache invalidated")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+# Create a single instance of SemanticCache
+chat_cache = SemanticCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.9"))
+)
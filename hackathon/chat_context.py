@@ -0,0 +1,143 @@
+import logging
+import re
+import threading
+
+import numpy as np
+
+from chat_cache import embed_text
+
+logger = logging.getLogger(__name__)
+
+_HEADING_RE = re.compile(r"^#{1,6}\s*(.+)$")
+_MARKDOWN_RE = re.compile(r"[*_`>]+")
+
+def split_sections(markdown: str) -> list:
+    """Split a markdown report into (heading, lines) sections"""
+    sections = []
+    heading, lines = "", []
+    for raw in markdown.splitlines():
+        line = raw.strip()
+        match = _HEADING_RE.match(line)
+        if match:
+            if lines:
+                sections.append((heading, lines))
+            heading, lines = match.group(1).strip(), []
+        elif line:
+            lines.append(_MARKDOWN_RE.sub("", line).lstrip("- ").strip())
+    if lines:
+        sections.append((heading, lines))
+    return sections
+
+def summarize_lines(lines: list, max_chars: int) -> str:
+    """Keep whole lines, in order, until the character budget is spent"""
+    summary = []
+    used = 0
+    for line in lines:
+        if not line:
+            continue
+        if used + len(line) > max_chars:
+            if not summary:
+                summary.append(line[:max_chars].rsplit(" ", 1)[0] + "...")
+            break
+        summary.append(line)
+        used += len(line) + 2
+    return "; ".join(summary)
+
+def build_passages(ai_insights: str, max_chars: int = 400) -> list:
+    """Chunk AI insights into short, self-contained passages"""
+    passages = []
+    for heading, lines in split_sections(ai_insights):
+        # Long sections are split so every passage stays within budget
+        chunk, size = [], 0
+        for line in lines:
+            if chunk and size + len(line) > max_chars:
+                passages.append(f"{heading}: {summarize_lines(chunk, max_chars)}")
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line)
+        if chunk:
+            passages.append(f"{heading}: {summarize_lines(chunk, max_chars)}" if heading else summarize_lines(chunk, max_chars))
+    return passages
+
+class ChatContextStore:
+    """Pre-chunked insight passages for the most recent analyses.
+
+    Passages are built and embedded once, when an analysis is stored, so
+    answering a chat message only costs one embedding and a small matrix
+    product no matter how much history the database holds.
+    """
+
+    def __init__(self, max_analyses: int = 3, max_chars: int = 400, loader=None):
+        self.max_analyses = max_analyses
+        self.max_chars = max_chars
+        self.loader = loader
+        self._analyses = []
+        self._passages = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self.loaded = loader is None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def add_analysis(self, data: dict):
+        """Index the insights of a newly stored analysis"""
+        ai_insights = data.get("analysis", {}).get("ai_insights", "") if isinstance(data, dict) else ""
+        if not isinstance(ai_insights, str) or not ai_insights.strip():
+            return
+        doc_id = data.get("_id")
+        passages = build_passages(ai_insights, self.max_chars)
+        with self._lock:
+            if doc_id is not None and any(analysis_id == doc_id for analysis_id, _, _ in self._analyses):
+                return
+            # Analyses can arrive out of order (loader pages, other workers), so keep them by timestamp
+            self._analyses.append((doc_id, str(data.get("timestamp", "")), passages))
+            self._analyses.sort(key=lambda analysis: analysis[1])
+            self._analyses = self._analyses[-self.max_analyses:]
+            self._rebuild()
+
+    def _rebuild(self):
+        # Newest analysis first so ties favour the freshest insights
+        self._passages = [p for _, _, passages in reversed(self._analyses) for p in passages]
+        if self._passages:
+            self._vectors = np.vstack([embed_text(p) for p in self._passages])
+        else:
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def load(self) -> bool:
+        """Read the most recent stored analyses once; returns True if this call did it.
+
+        Blocks on the database, so call it from warm-up or a worker thread;
+        concurrent first callers wait for the same load instead of seeing
+        an empty context.
+        """
+        if self.loaded:
+            return False
+        with self._load_lock:
+            if self.loaded:
+                return False
+            try:
+                documents = self.loader()
+                documents.sort(key=lambda doc: str(doc.get("timestamp", "")))
+                for doc in documents[-self.max_analyses:]:
+                    self.add_analysis(doc)
+            except Exception as e:
+                logger.error("Error loading chat context: %s", e)
+            self.loaded = True
+            return True
+
+    def retrieve(self, question: str, k: int = 4) -> list:
+        """Return the k passages most relevant to the question"""
+        self.load()
+        with self._lock:
+            if not self._passages:
+                return []
+            scores = self._vectors @ embed_text(question)
+            # Stable sort keeps the newest passages first among equal scores
+            order = np.argsort(-scores, kind="stable")[:k]
+            return [self._passages[i] for i in order]
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "analyses": len(self._analyses),
+            "passages": len(self._passages)
+        }
@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+def shorten(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+class ChatSessionStore:
+    """Rolling, size-bounded conversation history per chat session.
+
+    The most recent turns are kept verbatim; older turns are folded into a
+    short extractive summary whenever the history exceeds the token budget.
+    Sessions live in an in-memory LRU with a TTL and can optionally be
+    written through to a local SQLite file so they survive restarts. With
+    several workers sharing that file, a cached session is re-read whenever
+    the file holds a newer copy, so a conversation whose requests land on
+    different workers keeps every turn; without it sessions are per worker.
+    Reads and writes may hit SQLite, so call them off the event loop.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: int = 3600, token_budget: int = 600,
+                 keep_turns: int = 4, persist_path: str = None):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.persist_path = persist_path
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+
+    def _connection(self):
+        """The SQLite connection for this process, opened on first use.
+
+        The launcher imports this module before forking workers, and SQLite
+        connections must not be shared across processes, so each worker
+        opens its own.
+        """
+        if not self.persist_path:
+            return None
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.persist_path, check_same_thread=False)
+            self._db_pid = os.getpid()
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions (id TEXT PRIMARY KEY, data TEXT, updated REAL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def new_session_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def _load(self, session_id: str, newer_than: float = None):
+        """The stored session, if any (and only if updated after newer_than)"""
+        db = self._connection()
+        if not db:
+            return None
+        if newer_than is not None:
+            row = db.execute(
+                "SELECT data, updated FROM chat_sessions WHERE id = ? AND updated > ?", (session_id, newer_than)
+            ).fetchone()
+        else:
+            row = db.execute(
+                "SELECT data, updated FROM chat_sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def _save(self, session_id: str, session: dict):
+        db = self._connection()
+        if not db:
+            return
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO chat_sessions (id, data, updated) VALUES (?, ?, ?)",
+                (session_id, json.dumps(session), session["updated"])
+            )
+            db.execute(
+                "DELETE FROM chat_sessions WHERE updated < ?", (time.time() - self.ttl_seconds,)
+            )
+            db.commit()
+        except sqlite3.Error as e:
+            logger.error("Error persisting chat session: %s", e)
+
+    def _get(self, session_id: str) -> dict:
+        now = time.time()
+        session = self._sessions.get(session_id)
+        if session and now - session["updated"] > self.ttl_seconds:
+            del self._sessions[session_id]
+            session = None
+        if session is None:
+            session = self._load(session_id) or {"summary": [], "turns": [], "updated": now}
+            self._sessions[session_id] = session
+        else:
+            # Another worker may have added turns since this copy was cached
+            newer = self._load(session_id, newer_than=session["updated"])
+            if newer:
+                session = self._sessions[session_id] = newer
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def history(self, session_id: str) -> str:
+        """Return the conversation so far, formatted for the prompt"""
+        if not session_id:
+            return ""
+        with self._lock:
+            session = self._get(session_id)
+            lines = list(session["summary"])
+            lines += [f"User: {q}\nAssistant: {a}" for q, a in session["turns"]]
+        return "\n".join(lines)
+
+    def append(self, session_id: str, question: str, answer: str):
+        """Record a turn, folding older turns into the summary to stay in budget"""
+        with self._lock:
+            session = self._get(session_id)
+            session["turns"].append([question, answer])
+            session["updated"] = time.time()
+
+            def size():
+                text = "\n".join(session["summary"] + [f"{q} {a}" for q, a in session["turns"]])
+                return estimate_tokens(text)
+
+            while session["turns"] and (len(session["turns"]) > self.keep_turns or size() > self.token_budget):
+                old_question, old_answer = session["turns"].pop(0)
+                session["summary"].append(
+                    f"Earlier the user asked about {shorten(old_question, 80)} "
+                    f"and was told: {shorten(old_answer, 120)}"
+                )
+                # The summary itself is bounded too; the oldest points go first
+                while len(session["summary"]) > 1 and size() > self.token_budget:
+                    session["summary"].pop(0)
+
+            self._save(session_id, session)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "token_budget": self.token_budget,
+            "persistent": bool(self.persist_path)
+        }
+
+# Create a single instance of ChatSessionStore
+chat_sessions = ChatSessionStore(
+    max_sessions=int(os.getenv("CHAT_SESSION_LIMIT", "1000")),
+    ttl_seconds=int(os.getenv("CHAT_SESSION_TTL", "3600")),
+    token_budget=int(os.getenv("CHAT_SESSION_TOKENS", "600")),
+    persist_path=os.getenv("CHAT_SESSION_DB")
+)
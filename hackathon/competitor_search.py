@@ -0,0 +1,176 @@
+import contextvars
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Result pages requested in parallel per search, and results per page
+COMPETITOR_PAGES = int(os.getenv("COMPETITOR_PAGES", "3"))
+COMPETITOR_PAGE_SIZE = int(os.getenv("COMPETITOR_PAGE_SIZE", "30"))
+# Distinct competitors returned per search, and how many may share a domain
+COMPETITOR_RESULTS = int(os.getenv("COMPETITOR_RESULTS", "25"))
+COMPETITOR_MAX_PER_DOMAIN = int(os.getenv("COMPETITOR_MAX_PER_DOMAIN", "1"))
+
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|ref|ref_src|igshid|si)$", re.I)
+# Second-level labels under which registrable domains take three labels (bbc.co.uk)
+_SHARED_SLDS = {"co", "com", "org", "net", "gov", "ac", "edu"}
+
+def parse_weights(spec: str) -> dict:
+    """Parse COMPETITOR_SCORE_WEIGHTS like "rank=1,snippet=0.3,dated=0.1" """
+    weights = {"rank": 1.0, "snippet": 0.3, "dated": 0.1, "duplicates": 0.2}
+    for item in (spec or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            try:
+                weights[name.strip()] = float(value)
+            except ValueError:
+                logger.warning("Ignoring invalid score weight: %s", item)
+    return weights
+
+def canonical_url(url: str) -> str:
+    """Normalize a result URL so syndicated and tracked variants compare equal"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = re.sub(r"/(amp|index\.html?)/?$", "", parts.path).rstrip("/") or "/"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _TRACKING_PARAMS.match(key)
+    ))
+    return urlunsplit(("https", host, path, query, ""))
+
+def domain_of(url: str) -> str:
+    """Registrable domain of a URL (approximate, without a public-suffix list)"""
+    labels = (urlsplit(url).hostname or "").lower().split(".")
+    if len(labels) >= 3 and labels[-2] in _SHARED_SLDS and len(labels[-1]) == 2:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+def score_result(result: dict, rank: int, duplicates: int, weights: dict) -> float:
+    """Higher is better: search rank, snippet richness, dated content and syndication"""
+    return (
+        weights.get("rank", 0.0) / (1 + rank)
+        + weights.get("snippet", 0.0) * min(len(result.get("snippet", "")), 300) / 300
+        + weights.get("dated", 0.0) * bool(result.get("date"))
+        + weights.get("duplicates", 0.0) * min(duplicates, 5) / 5
+    )
+
+def merge_results(pages: list, target: int = COMPETITOR_RESULTS, max_per_domain: int = COMPETITOR_MAX_PER_DOMAIN,
+                  weights: dict = None) -> list:
+    """Merge ranked result pages into a deduplicated, scored competitor list.
+
+    Results are deduplicated by canonical URL (the best-ranked copy wins and
+    the number of copies counts in its favour), then at most max_per_domain
+    results are kept per registrable domain, highest score first.
+    """
+    weights = weights or parse_weights(os.getenv("COMPETITOR_SCORE_WEIGHTS", ""))
+    by_url = {}
+    rank = 0
+    for page in pages:
+        for result in page:
+            if not result.get("link"):
+                continue
+            key = canonical_url(result["link"])
+            if key in by_url:
+                by_url[key]["duplicates"] += 1
+                continue
+            by_url[key] = {"result": result, "rank": rank, "duplicates": 0}
+            rank += 1
+
+    scored = sorted(
+        by_url.values(),
+        key=lambda entry: (-score_result(entry["result"], entry["rank"], entry["duplicates"], weights), entry["rank"])
+    )
+    per_domain = {}
+    results = []
+    for entry in scored:
+        domain = domain_of(entry["result"]["link"])
+        if per_domain.get(domain, 0) >= max_per_domain:
+            continue
+        per_domain[domain] = per_domain.get(domain, 0) + 1
+        results.append(entry["result"])
+        if len(results) >= target:
+            break
+    return results
+
+class CompetitorSearch:
+    """Fetch several result pages concurrently and merge them.
+
+    fetch_page(query, offset, count, timeout=...) performs one upstream
+    request. Pages that fail or miss the timeout are left out; the search
+    only fails if no page succeeds.
+    """
+
+    def __init__(self, pages: int = COMPETITOR_PAGES, page_size: int = COMPETITOR_PAGE_SIZE, max_workers: int = 8):
+        self.pages = pages
+        self.page_size = page_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="competitor-search")
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.pages_fetched = 0
+        self.pages_failed = 0
+        self.raw_results = 0
+        self.unique_results = 0
+
+    def search(self, query: str, fetch_page, timeout: float = None, target: int = COMPETITOR_RESULTS,
+               page_count: int = None) -> list:
+        stop_at = time.monotonic() + timeout if timeout else None
+
+        def bounded_fetch(offset):
+            # A page still queued when the search times out is never sent (or charged)
+            remaining = stop_at - time.monotonic() if stop_at else None
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("result page not started before the search timed out")
+            return fetch_page(query, offset, self.page_size, timeout=remaining)
+
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, bounded_fetch, page * self.page_size)
+            for page in range(page_count or self.pages)
+        ]
+        done, not_done = wait(futures, timeout=timeout)
+        for future in not_done:
+            future.cancel()
+
+        pages = []
+        errors = []
+        # Keep page order so upstream rank is preserved across pages
+        for future in futures:
+            if future not in done:
+                errors.append(TimeoutError("result page timed out"))
+            elif future.exception() is not None:
+                errors.append(future.exception())
+            else:
+                pages.append(future.result())
+        if not pages:
+            raise errors[0] if errors else RuntimeError("no result pages requested")
+        for error in errors:
+            logger.warning("Competitor result page failed: %.200s", error)
+
+        results = merge_results(pages, target=target)
+        with self._lock:
+            self.searches += 1
+            self.pages_fetched += len(pages)
+            self.pages_failed += len(errors)
+            self.raw_results += sum(len(page) for page in pages)
+            self.unique_results += len(results)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "searches": self.searches,
+                "pages_fetched": self.pages_fetched,
+                "pages_failed": self.pages_failed,
+                "raw_results": self.raw_results,
+                "unique_results": self.unique_results
+            }
+
+# Create a single instance of CompetitorSearch
+competitor_search = CompetitorSearch()
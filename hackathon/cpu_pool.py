@@ -0,0 +1,161 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+def _init_worker():
+    """Load the NLP models once per pool process"""
+    from scrap import get_nlp, analyze_sentiment
+    get_nlp()
+    analyze_sentiment("warm up")
+
+def default_workers() -> int:
+    """CPU pool size per web worker: the cores shared out across WEB_CONCURRENCY workers.
+
+    Every pool process loads its own spaCy, so a full-width pool in each of N
+    pre-forked web workers would cost N x cores interpreters.
+    """
+    web_workers = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+    return max((os.cpu_count() or 1) // web_workers, 1)
+
+def _timed_call(func, args, submitted_at):
+    started_at = time.time()
+    result = func(*args)
+    return started_at, time.time(), result
+
+class CPUPool:
+    """Process pool for CPU-bound NLP work with bounded submission.
+
+    At most max_pending batches may be queued or running at once; callers
+    beyond that block for up to submit_timeout seconds and then run the batch
+    inline, so a saturated pool slows requests down instead of growing an
+    unbounded queue. With workers=0 everything runs inline.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = None, submit_timeout: float = 5.0,
+                 start_method: str = "spawn"):
+        self.workers = workers if workers is not None else default_workers()
+        self.max_pending = max_pending or max(self.workers * 4, 1)
+        self.submit_timeout = submit_timeout
+        self.start_method = start_method
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.inline = 0
+        self.queue_wait = 0.0
+        self.run_time = 0.0
+        self.max_queue_wait = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=_init_worker
+                    )
+                    logger.info("Started CPU pool with %s workers", self.workers)
+        return self._executor
+
+    def _record(self, future, submitted_at):
+        self._slots.release()
+        with self._stats_lock:
+            self.pending -= 1
+            try:
+                started_at, finished_at, _ = future.result()
+            except Exception:
+                self.failed += 1
+                return
+            self.completed += 1
+            wait = max(started_at - submitted_at, 0.0)
+            self.queue_wait += wait
+            self.max_queue_wait = max(self.max_queue_wait, wait)
+            self.run_time += finished_at - started_at
+
+    def _run_inline(self, func, args):
+        with self._stats_lock:
+            self.inline += 1
+        return func(*args)
+
+    def _submit(self, func, args):
+        """Submit a call, or return None if it should run inline"""
+        if not self._slots.acquire(timeout=self.submit_timeout):
+            logger.warning("CPU pool saturated, running task inline")
+            return None
+        submitted_at = time.time()
+        try:
+            future = self._get_executor().submit(_timed_call, func, args, submitted_at)
+        except Exception as e:
+            self._slots.release()
+            logger.error("CPU pool submit failed, running inline: %s", e)
+            return None
+        with self._stats_lock:
+            self.pending += 1
+            self.submitted += 1
+        future.add_done_callback(lambda f: self._record(f, submitted_at))
+        return future
+
+    def _result(self, future, func, args):
+        if future is None:
+            return self._run_inline(func, args)
+        try:
+            return future.result()[2]
+        except Exception as e:
+            logger.error("CPU pool task failed: %s", e)
+            raise
+
+    def run(self, func, *args):
+        """Run a single call on the pool and return its result"""
+        if self.workers <= 0:
+            return self._run_inline(func, args)
+        return self._result(self._submit(func, args), func, args)
+
+    def map_batches(self, func, items: list, batch_size: int = 32) -> list:
+        """Apply func to consecutive batches of items and return the results in order"""
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        if not batches:
+            return []
+        if self.workers <= 0:
+            return [self._run_inline(func, (batch,)) for batch in batches]
+
+        futures = [self._submit(func, (batch,)) for batch in batches]
+        return [self._result(future, func, (batch,)) for future, batch in zip(futures, batches)]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "inline": self.inline,
+                "avg_queue_wait_ms": round(self.queue_wait / completed * 1000, 2),
+                "max_queue_wait_ms": round(self.max_queue_wait * 1000, 2),
+                "avg_run_ms": round(self.run_time / completed * 1000, 2)
+            }
+
+# Create a single instance of CPUPool
+cpu_pool = CPUPool(
+    workers=int(os.getenv("CPU_POOL_WORKERS", default_workers())),
+    max_pending=int(os.getenv("CPU_POOL_MAX_PENDING", "0")) or None,
+    submit_timeout=float(os.getenv("CPU_POOL_SUBMIT_TIMEOUT", "5")),
+    start_method=os.getenv("CPU_POOL_START_METHOD", "spawn")
+)
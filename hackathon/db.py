@@ -1,132 +1,234 @@
-from astrapy.db import AstraDB
 import os
 from dotenv import load_dotenv
 from datetime import datetime
 import json
 import logging
+import threading
+from log_config import log_payload
 
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Initialize the client
-db = AstraDB(
-    token = os.getenv("token_astra"),
-    api_endpoint=os.getenv("api_endpoint")
-)
+# Initialize the client (deferred until the database is first used)
+def create_client():
+    from astrapy.db import AstraDB
+    return AstraDB(
+        token = os.getenv("token_astra"),
+        api_endpoint=os.getenv("api_endpoint")
+    )
 
 class DatabaseManager:
-    def __init__(self):
+    """AstraDB access plus insert notifications for in-process consumers.
+
+    With insert_log_path set, every insert is also appended to a shared log
+    that the other worker processes read in sync_inserts(), so listeners in
+    every worker see every stored analysis, not just the ones their own
+    process inserted.
+    """
+
+    def __init__(self, insert_log_path: str = None):
+        self.insert_listeners = []
+        self.insert_log_path = insert_log_path
+        self._collection = None
+        self._connect_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._log_offset = None
+        self._log_pid = None
+    
+    @property
+    def collection(self):
+        """The market_research collection, connecting on first access"""
+        if self._collection is None:
+            with self._connect_lock:
+                if self._collection is None:
+                    try:
+                        self._collection = create_client().collection("market_research")
+                        logger.info("Connected to AstraDB collection: market_research")
+                    except Exception as e:
+                        logger.error("Failed to connect to database: %s", e)
+                        raise
+        return self._collection
+    
+    def add_insert_listener(self, callback):
+        """Register a callback(data) to run after a document is inserted"""
+        self.insert_listeners.append(callback)
+    
+    def _notify_insert(self, data):
+        for callback in self.insert_listeners:
+            try:
+                callback(data)
+            except Exception as e:
+                logger.error("Insert listener %s failed: %s", callback, e)
+    
+    def _start_log(self):
+        # Each worker reads only entries appended after it started; older
+        # analyses reach its listeners through their database loaders
+        if self._log_pid != os.getpid():
+            self._log_pid = os.getpid()
+            try:
+                self._log_offset = os.path.getsize(self.insert_log_path)
+            except OSError:
+                self._log_offset = 0
+    
+    def _log_insert(self, data):
+        """Append an inserted document to the shared insert log for the other workers"""
+        if not self.insert_log_path:
+            return
+        # Chart data is derived from the analysis and no listener needs it
+        entry = {"pid": os.getpid(), "doc": {k: v for k, v in data.items() if k != "charts_data"}}
+        line = (json.dumps(entry, default=str) + "\n").encode()
         try:
-            self.collection = db.collection("market_research")
-            print("✅ Connected to AstraDB collection: market_research")
-        except Exception as e:
-            print(f"❌ Failed to connect to database: {str(e)}")
-            raise
+            with self._log_lock:
+                self._start_log()
+                # One O_APPEND write per entry, so appends from several workers do not interleave
+                fd = os.open(self.insert_log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            logger.error("Error writing insert log: %s", e)
+    
+    def sync_inserts(self):
+        """Run the insert listeners for documents other workers inserted since the last call"""
+        if not self.insert_log_path:
+            return
+        with self._log_lock:
+            self._start_log()
+            if not os.path.exists(self.insert_log_path):
+                return
+            try:
+                if os.path.getsize(self.insert_log_path) <= self._log_offset:
+                    return
+                with open(self.insert_log_path, "rb") as f:
+                    f.seek(self._log_offset)
+                    data = f.read()
+            except OSError as e:
+                logger.error("Error reading insert log: %s", e)
+                return
+            # A trailing partial line is still being written; read it next time
+            data = data[:data.rfind(b"\n") + 1]
+            self._log_offset += len(data)
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping unreadable insert log entry")
+                continue
+            if entry.get("pid") != os.getpid():
+                self._notify_insert(entry["doc"])
     
     def clear_collection(self):
         """Clear all data from the collection"""
         try:
-            print("🗑️ Clearing collection...")
+            logger.debug("Clearing collection")
             # Delete all documents in the collection
             result = self.collection.delete_many({})
             count = result.deleted_count if result else 0
-            print(f"✅ Cleared {count} documents from collection")
+            logger.info("Cleared %s documents from collection", count)
             return True
         except Exception as e:
-            print(f"❌ Error clearing collection: {str(e)}")
+            logger.error("Error clearing collection: %s", e)
             return False
     
     def insert_document(self, data):
         """Insert a single document into the collection"""
         try:
-            print("📥 Starting document insertion...")
-            
-            # First, clear the collection
-            self.clear_collection()
+            logger.debug("Starting document insertion")
             
             # Verify data structure
-            print("📋 Verifying data structure...")
             required_fields = ["query", "timestamp", "analysis", "charts_data"]
             for field in required_fields:
                 if field not in data:
-                    print(f"❌ Missing required field: {field}")
+                    logger.error("Missing required field: %s", field)
                     return None
             
-            # Debug print the data being inserted
-            print("📝 Data being inserted:")
-            print(json.dumps(data, indent=2))
+            # Dump a sample of inserted documents when debugging
+            log_payload(logger, "Data being inserted", data)
             
             # Insert the document
-            print("💾 Inserting document into database...")
             result = self.collection.insert_one(data)
             
             if result:
-                print(f"✅ Document inserted successfully with ID: {result}")
+                logger.info("Document inserted successfully: %s", result)
+                self._notify_insert(data)
+                self._log_insert(data)
                 
-                # Verify the document was inserted
-                inserted_doc = self.collection.find_one({"_id": result.inserted_id})
-                if inserted_doc:
-                    print("✅ Document verified in database")
-                    print(json.dumps(inserted_doc, indent=2))
-                else:
-                    print("⚠️ Could not verify inserted document")
+                # Verify the document was inserted (debugging aid only)
+                if logger.isEnabledFor(logging.DEBUG):
+                    inserted_doc = self.collection.find_one({"_id": result.inserted_id})
+                    if inserted_doc:
+                        log_payload(logger, "Document verified in database", inserted_doc)
+                    else:
+                        logger.warning("Could not verify inserted document")
             else:
-                print("❌ No result returned from database insertion")
+                logger.error("No result returned from database insertion")
             
             return result
                 
         except Exception as e:
-            print(f"❌ Error inserting document: {str(e)}")
-            print(f"Error type: {type(e)}")
-            print(f"Error details: {str(e)}")
+            logger.error("Error inserting document (%s): %s", type(e).__name__, e)
+            return None
+    
+    def get_document(self, document_id):
+        """Get a single document by its _id, or None"""
+        try:
+            response = self.collection.find_one({"_id": document_id})
+            # Handle AstraDB response format
+            if isinstance(response, dict) and "data" in response:
+                return response.get("data", {}).get("document")
+            return response
+        except Exception as e:
+            logger.error("Error fetching document %s: %s", document_id, e)
             return None
     
     def get_all_documents(self):
-        """Get all documents from the collection"""
+        """Get all documents from the collection, following the Data API's page state"""
         try:
-            print("📚 Fetching all documents...")
-            response = self.collection.find({})
-            
-            print("🔍 Raw response type:", type(response))
-            print("🔍 Raw response structure:", json.dumps(response, indent=2))
-            
-            # Extract documents from AstraDB response structure
-            if isinstance(response, dict):
-                # Handle AstraDB response format
-                documents = response.get('data', {}).get('documents', [])
-            else:
-                documents = []
-            
+            logger.debug("Fetching all documents")
             results = []
-            for doc in documents:
-                if isinstance(doc, dict):
-                    # Document is already a dictionary
-                    results.append(doc)
-                elif isinstance(doc, str):
-                    try:
-                        parsed_doc = json.loads(doc)
-                        results.append(parsed_doc)
-                    except json.JSONDecodeError:
-                        print(f"⚠️ Could not parse document: {doc[:100]}...")
-                        continue
+            page_state = None
+            while True:
+                options = {"pageState": page_state} if page_state else None
+                response = self.collection.find({}, options=options)
+                
+                log_payload(logger, "Raw find response", response)
+                
+                # Extract documents from AstraDB response structure
+                if isinstance(response, dict):
+                    # Handle AstraDB response format; each page holds at most ~20 documents
+                    data = response.get('data', {})
+                    documents = data.get('documents', [])
+                    page_state = data.get('nextPageState')
+                else:
+                    documents = []
+                    page_state = None
+                
+                for doc in documents:
+                    if isinstance(doc, dict):
+                        # Document is already a dictionary
+                        results.append(doc)
+                    elif isinstance(doc, str):
+                        try:
+                            parsed_doc = json.loads(doc)
+                            results.append(parsed_doc)
+                        except json.JSONDecodeError:
+                            logger.warning("Could not parse document: %.100s...", doc)
+                            continue
+                
+                if not page_state:
+                    break
                     
-            print(f"✅ Retrieved {len(results)} valid documents")
-            
-            # Debug print first document if available
-            if results:
-                print("📝 First document structure:")
-                print(json.dumps(results[0], indent=2))
-            else:
-                print("⚠️ No valid documents found")
-            
+            logger.info("Retrieved %d valid documents", len(results))
             return results
             
         except Exception as e:
-            print(f"❌ Error fetching documents: {str(e)}")
-            print(f"Error type: {type(e)}")
-            print(f"Error details: {str(e)}")
+            logger.error("Error fetching documents (%s): %s", type(e).__name__, e)
             return []
 
-# Create a single instance of DatabaseManager
-db_manager = DatabaseManager()
\ No newline at end of file
+# Create a single instance of DatabaseManager; the insert log is only
+# needed when the launcher runs several worker processes
+db_manager = DatabaseManager(
+    insert_log_path=os.getenv("INSERT_LOG_PATH") or ("insert_log.jsonl" if int(os.getenv("WEB_CONCURRENCY", "1")) > 1 else None)
+)
\ No newline at end of file
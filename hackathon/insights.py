@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+def sentiment_label(score: float) -> str:
+    return "Positive" if score > 0 else "Negative" if score < 0 else "Neutral"
+
+class InsightAggregates:
+    """Cross-query aggregates maintained as analyses are stored.
+
+    Each insert updates topic counts, a bounded heap of the best-received
+    competitor strategies and running sentiment sums, so the insight
+    endpoints read precomputed values instead of scanning every stored
+    analysis. History already in the database is folded in once, on first
+    use, through loader; analyses are counted once per _id, however they
+    arrive.
+    """
+
+    def __init__(self, top_n: int = 5, window: int = 50, loader=None):
+        self.top_n = top_n
+        self.window = window
+        self.loader = loader
+        self.loaded = loader is None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._topic_counts = {}
+        self._top_topics = {}
+        self._total_topics = 0
+        self._strategies = []
+        self._strategy_order = itertools.count()
+        self._total_strategies = 0
+        self._sentiment_sum = 0.0
+        self._sentiment_count = 0
+        self._recent = deque()
+        self._recent_sum = 0.0
+        self._ids = set()
+
+    def load(self) -> bool:
+        """Fold stored history in once; returns True if this call did it"""
+        if self.loaded:
+            return False
+        with self._load_lock:
+            if self.loaded:
+                return False
+            try:
+                for doc in self.loader():
+                    self._add(doc)
+            except Exception as e:
+                logger.error("Error loading insight aggregates: %s", e)
+            self.loaded = True
+            return True
+
+    def add_analysis(self, data: dict):
+        """Update the aggregates with a newly stored analysis"""
+        # A first load may or may not have read this analysis; _add skips it if so
+        self.load()
+        self._add(data)
+
+    def _add(self, data: dict):
+        analysis = data.get("analysis", {}) if isinstance(data, dict) else {}
+        metadata = analysis.get("metadata", {})
+        doc_id = data.get("_id") if isinstance(data, dict) else None
+        with self._lock:
+            if doc_id is not None:
+                if str(doc_id) in self._ids:
+                    return
+                self._ids.add(str(doc_id))
+            for topic in metadata.get("key_topics", []):
+                self._count_topic(topic)
+
+            for competitor in analysis.get("competitor_analysis", []):
+                if not competitor.get("summary"):
+                    continue
+                self._total_strategies += 1
+                entry = (competitor.get("sentiment", 0), next(self._strategy_order), {
+                    "summary": competitor.get("summary"),
+                    "sentiment": competitor.get("sentiment", 0)
+                })
+                if len(self._strategies) < self.top_n:
+                    heapq.heappush(self._strategies, entry)
+                elif entry[0] > self._strategies[0][0]:
+                    heapq.heapreplace(self._strategies, entry)
+
+            score = metadata.get("market_sentiment", {}).get("score", 0)
+            self._sentiment_sum += score
+            self._sentiment_count += 1
+            self._recent.append(score)
+            self._recent_sum += score
+            if len(self._recent) > self.window:
+                self._recent_sum -= self._recent.popleft()
+
+    def _count_topic(self, topic: str):
+        count = self._topic_counts.get(topic, 0) + 1
+        self._topic_counts[topic] = count
+        self._total_topics += 1
+        # Counts only grow, so a topic can only enter the top list when it is incremented
+        if topic in self._top_topics or len(self._top_topics) < self.top_n:
+            self._top_topics[topic] = count
+            return
+        weakest = min(self._top_topics, key=self._top_topics.get)
+        if count > self._top_topics[weakest]:
+            del self._top_topics[weakest]
+            self._top_topics[topic] = count
+
+    def market_trends(self) -> dict:
+        self.load()
+        with self._lock:
+            return {
+                "top_trends": dict(sorted(self._top_topics.items(), key=lambda x: x[1], reverse=True)),
+                "total_topics": self._total_topics
+            }
+
+    def competitor_strategies(self) -> dict:
+        self.load()
+        with self._lock:
+            return {
+                "top_strategies": [entry[2] for entry in sorted(self._strategies, key=lambda x: (-x[0], x[1]))],
+                "total_analyzed": self._total_strategies
+            }
+
+    def average_sentiment(self) -> dict:
+        self.load()
+        with self._lock:
+            average = self._sentiment_sum / self._sentiment_count if self._sentiment_count else 0
+            rolling = self._recent_sum / len(self._recent) if self._recent else 0
+            return {
+                "average_score": round(average, 2),
+                "label": sentiment_label(average),
+                "rolling_average": round(rolling, 2),
+                "rolling_label": sentiment_label(rolling),
+                "window": len(self._recent),
+                "total_analyzed": self._sentiment_count
+            }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "analyses": self._sentiment_count,
+                "distinct_topics": len(self._topic_counts),
+                "strategies": self._total_strategies
+            }
@@ -0,0 +1,209 @@
+"""Production launcher: preload shared resources, then fork uvicorn workers.
+
+Usage:
+    python launcher.py --workers 16 [--host 0.0.0.0] [--port 8000]
+
+The parent process imports the app and loads the read-only NLP resources
+(spaCy model, TextBlob, pandas) once, freezes them out of the garbage
+collector and then forks the workers, which share those pages copy-on-write.
+Network clients (database, Gemini, Google Trends) are still created lazily
+inside each worker after the fork.
+
+Signals sent to the parent:
+    SIGHUP          rolling restart of the workers, one at a time
+    SIGINT/SIGTERM  graceful shutdown of all workers
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+from log_config import configure_logging
+
+logger = logging.getLogger("launcher")
+
+# Components that hold no sockets or threads and are safe to share across fork
+PRELOAD_COMPONENTS = ["nlp", "sentiment", "pandas"]
+
+def memory_usage(pid: int = None) -> dict:
+    """Resident, proportional, shared and private memory of a process in MB"""
+    pid = pid or os.getpid()
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[0].endswith(":"):
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return {}
+
+    def mb(*names):
+        return round(sum(fields.get(name, 0) for name in names) / 1024, 1)
+
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty")
+    }
+
+def preload():
+    """Import the app and load shared resources in the parent process"""
+    import server
+    start = time.perf_counter()
+    server.warmup.run(PRELOAD_COMPONENTS)
+    logger.info("Preloaded %s in %.2fs: %s", PRELOAD_COMPONENTS, time.perf_counter() - start, server.warmup.status)
+    # Keep the preloaded objects out of GC passes so workers don't dirty their pages
+    gc.collect()
+    gc.freeze()
+    return server.app
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+class Supervisor:
+    """Fork, watch and restart a fixed number of uvicorn workers"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, report_interval: int = 60,
+                 restart_timeout: int = 30):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.report_interval = report_interval
+        self.restart_timeout = restart_timeout
+        self.pids = set()
+        self.stopping = False
+        self.restart_requested = False
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            logger.info("Started worker %s", pid)
+            return pid
+
+        # Worker: drop the parent's handlers and serve on the shared socket
+        for sig in (signal.SIGHUP, signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, signal.SIG_DFL)
+        status = 0
+        try:
+            import uvicorn
+            config = uvicorn.Config(self.app, log_level="info")
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker crashed")
+            status = 1
+        finally:
+            os._exit(status)
+
+    def reap(self):
+        """Collect exited workers, respawning them unless shutting down"""
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.pids.clear()
+                return
+            if pid == 0:
+                return
+            if pid in self.pids:
+                self.pids.discard(pid)
+                logger.info("Worker %s exited with status %s", pid, os.waitstatus_to_exitcode(status))
+                if not self.stopping:
+                    self.spawn()
+
+    def rolling_restart(self):
+        """Replace workers one by one so capacity never drops to zero"""
+        logger.info("Rolling restart of workers")
+        for old_pid in list(self.pids):
+            self.pids.discard(old_pid)
+            self.spawn()
+            try:
+                os.kill(old_pid, signal.SIGTERM)
+            except ProcessLookupError:
+                continue
+            deadline = time.monotonic() + self.restart_timeout
+            while time.monotonic() < deadline:
+                pid, _ = os.waitpid(old_pid, os.WNOHANG)
+                if pid:
+                    break
+                time.sleep(0.2)
+            else:
+                logger.warning("Worker %s did not stop in time, killing it", old_pid)
+                os.kill(old_pid, signal.SIGKILL)
+                os.waitpid(old_pid, 0)
+
+    def report(self):
+        parent = memory_usage()
+        workers = {pid: memory_usage(pid) for pid in sorted(self.pids)}
+        total_pss = parent.get("pss_mb", 0) + sum(usage.get("pss_mb", 0) for usage in workers.values())
+        logger.info("Workers: %s/%s, total PSS %.1f MB, parent %s", len(workers), self.workers, total_pss, parent)
+        for pid, usage in workers.items():
+            logger.info("  worker %s: %s", pid, usage)
+
+    def run(self):
+        def request_restart(*_):
+            self.restart_requested = True
+
+        def request_stop(*_):
+            self.stopping = True
+
+        signal.signal(signal.SIGHUP, request_restart)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGTERM, request_stop)
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        last_report = time.monotonic()
+        while not self.stopping:
+            time.sleep(1)
+            if self.restart_requested:
+                self.restart_requested = False
+                self.rolling_restart()
+            self.reap()
+            if self.report_interval and time.monotonic() - last_report >= self.report_interval:
+                self.report()
+                last_report = time.monotonic()
+
+        logger.info("Shutting down workers")
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.pids):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        self.pids.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with preloaded, fork-shared workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--report-interval", type=int, default=60, help="seconds between memory reports")
+    args = parser.parse_args()
+
+    configure_logging()
+
+    # Sizes per-worker resources (e.g. the CPU pool) before the app is imported
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    app = preload()
+    sock = bind_socket(args.host, args.port)
+    logger.info("Listening on %s:%s with %s workers", args.host, args.port, args.workers)
+    Supervisor(app, sock, args.workers, args.report_interval).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed via extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# Share of log_payload calls that actually dump their payload at DEBUG
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE", "0.01"))
+
+_listener = None
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LazyJSON:
+    """Defer json.dumps of a payload until a log record is actually emitted"""
+
+    __slots__ = ("payload", "indent")
+
+    def __init__(self, payload, indent=None):
+        self.payload = payload
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.payload, indent=self.indent, default=str)
+
+def log_payload(logger, message: str, payload, sample_rate: float = None):
+    """Log a large payload at DEBUG, for only a sample of calls.
+
+    Costs a level check when DEBUG is off, so it is safe on hot paths.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    rate = PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return
+    logger.debug("%s: %s", message, LazyJSON(payload))
+
+def parse_levels(spec: str) -> dict:
+    """Parse LOG_LEVELS like "scrap=DEBUG,db=WARNING" """
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging(level: str = None, module_levels: dict = None, json_output: bool = None,
+                      log_file: str = None):
+    """Route all logging through a queue to a background writer thread.
+
+    Callers only pay for the level check and for putting the record on the
+    queue; formatting and I/O happen on the listener thread. Levels come from
+    LOG_LEVEL and per-module LOG_LEVELS, output format from LOG_FORMAT
+    (json or text). Calling this again reconfigures the handlers.
+    """
+    global _listener
+
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    module_levels = module_levels if module_levels is not None else parse_levels(os.getenv("LOG_LEVELS", ""))
+    if json_output is None:
+        json_output = os.getenv("LOG_FORMAT", "text").lower() == "json"
+
+    if json_output:
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+def _restart_after_fork():
+    # The writer thread does not survive fork(); give the child its own
+    # queue and listener with the same handlers
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_after_fork)
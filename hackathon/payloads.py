@@ -0,0 +1,182 @@
+import gzip
+import threading
+import time
+
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+class PayloadStats:
+    """Per-endpoint response size and serialization time"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _entry(self, endpoint: str) -> dict:
+        return self._endpoints.setdefault(endpoint, {
+            "responses": 0, "bytes": 0, "serialize_seconds": 0.0,
+            "compressed_responses": 0, "compressed_input_bytes": 0, "compressed_bytes": 0
+        })
+
+    def record_serialization(self, endpoint: str, size: int, seconds: float):
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry["responses"] += 1
+            entry["bytes"] += size
+            entry["serialize_seconds"] += seconds
+
+    def record_compression(self, endpoint: str, size: int, compressed_size: int):
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry["compressed_responses"] += 1
+            entry["compressed_input_bytes"] += size
+            entry["compressed_bytes"] += compressed_size
+
+    def stats(self) -> dict:
+        with self._lock:
+            report = {}
+            for endpoint, entry in self._endpoints.items():
+                responses = entry["responses"] or 1
+                compressed_input = entry["compressed_input_bytes"] or 1
+                report[endpoint] = {
+                    "responses": entry["responses"],
+                    "avg_bytes": round(entry["bytes"] / responses),
+                    "avg_serialize_ms": round(entry["serialize_seconds"] / responses * 1000, 3),
+                    "compressed_responses": entry["compressed_responses"],
+                    "compression_ratio": round(entry["compressed_bytes"] / compressed_input, 3)
+                }
+            return report
+
+payload_stats = PayloadStats()
+
+def parse_fields(fields: str) -> list:
+    """Split a fields= query parameter into dotted paths"""
+    return [field.strip() for field in (fields or "").split(",") if field.strip()]
+
+def project(doc: dict, fields: list, keep=("_id", "query", "timestamp")) -> dict:
+    """Return only the requested dotted paths of a document.
+
+    Paths are relative to the document, e.g. ``analysis.metadata``; a bare
+    section name that is not a top-level key is looked up under ``analysis``,
+    so ``fields=metadata,ai_insights`` works too. Identifying keys in keep are
+    always included.
+    """
+    if not fields or not isinstance(doc, dict):
+        return doc
+
+    projected = {key: doc[key] for key in keep if key in doc}
+    for field in fields:
+        path = field.split(".")
+        if path[0] not in doc and isinstance(doc.get("analysis"), dict) and path[0] in doc["analysis"]:
+            path = ["analysis"] + path
+
+        value = doc
+        for part in path:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            for part in path[:-1]:
+                target = target.setdefault(part, {})
+            target[path[-1]] = value
+    return projected
+
+def _default(value):
+    return str(value)
+
+def json_response(endpoint: str, content, status_code: int = 200) -> Response:
+    """Serialize content with orjson, recording size and time per endpoint"""
+    start = time.perf_counter()
+    body = orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    )
+    payload_stats.record_serialization(endpoint, len(body), time.perf_counter() - start)
+    return Response(body, status_code=status_code, media_type="application/json")
+
+def choose_encoding(accept_encoding: str):
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    candidates = ["br", "gzip"] if brotli else ["gzip"]
+    wildcard = weights.get("*", 0.0)
+    best = max(candidates, key=lambda name: weights.get(name, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+class CompressionMiddleware:
+    """Compress complete responses with brotli or gzip as the client allows.
+
+    Streaming responses (more than one body message, e.g. server-sent
+    events) and small bodies are passed through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if (message.get("more_body", False) or len(body) < self.minimum_size
+                    or "content-encoding" in headers
+                    or headers.get("content-type", "").startswith("text/event-stream")):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self.compress(body, encoding)
+            payload_stats.record_compression(scope.get("path", ""), len(body), len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
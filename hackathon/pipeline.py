@@ -0,0 +1,124 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """A named step of the analysis pipeline.
+
+    func is called with the outputs named in inputs as keyword arguments
+    (inputs may also map parameter names to output names) and its return
+    value becomes the output named after the stage. Stages with a
+    source are upstream calls: they go through the request's StageRunner
+    (deadline, circuit breaker, ``timeout`` keyword) and fall back to default.
+    """
+
+    def __init__(self, name: str, func, inputs=(), source: str = None, default=None):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs) if isinstance(inputs, dict) else {name: name for name in inputs}
+        self.source = source
+        self.default = default
+
+class Pipeline:
+    """Run a graph of stages, in parallel wherever their inputs allow.
+
+    Only the stages needed for the requested targets run, and outputs that
+    are passed in up front are used as-is instead of being recomputed. A
+    stage that raises gets its default, so one failing source never takes
+    the whole analysis down. Every run records per-stage timings.
+
+    Each run gets its own threads, at most max_workers, so a slow analysis
+    never holds up the stages of another request.
+    """
+
+    def __init__(self, stages: list, max_workers: int = 16):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._timings = {}
+
+    def required(self, targets: list, provided: dict) -> list:
+        """Stages needed to produce targets, given outputs already provided"""
+        needed = []
+        seen = set()
+
+        def visit(name, path):
+            if name in seen or name in provided:
+                return
+            if name in path:
+                raise ValueError(f"Cycle in pipeline at stage {name}")
+            if name not in self.stages:
+                raise KeyError(f"No stage produces {name}")
+            for dependency in self.stages[name].inputs.values():
+                visit(dependency, path | {name})
+            seen.add(name)
+            needed.append(name)
+
+        for target in targets:
+            visit(target, frozenset())
+        return needed
+
+    def _call(self, stage: Stage, runner, kwargs: dict):
+        start = time.perf_counter()
+        try:
+            if stage.source and runner is not None:
+                return runner.run(stage.source, stage.func, default=stage.default, **kwargs)
+            return stage.func(**kwargs)
+        except Exception as e:
+            logger.error("Stage %s failed: %s", stage.name, e)
+            return stage.default
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                timing = self._timings.setdefault(stage.name, {"runs": 0, "seconds": 0.0, "max_seconds": 0.0})
+                timing["runs"] += 1
+                timing["seconds"] += elapsed
+                timing["max_seconds"] = max(timing["max_seconds"], elapsed)
+
+    def run(self, targets: list, inputs: dict, runner=None) -> tuple:
+        """Compute targets from inputs; returns (outputs, timings in ms per stage)"""
+        outputs = dict(inputs)
+        remaining = self.required(targets, outputs)
+        running = {}
+        started = {}
+        timings = {}
+        if not remaining:
+            return outputs, timings
+        executor = ThreadPoolExecutor(max_workers=min(len(remaining), self.max_workers), thread_name_prefix="pipeline")
+
+        while remaining or running:
+            ready = [name for name in remaining if all(dep in outputs for dep in self.stages[name].inputs.values())]
+            for name in ready:
+                stage = self.stages[name]
+                kwargs = {param: outputs[dep] for param, dep in stage.inputs.items()}
+                # Each stage runs in a copy of the caller's context so context
+                # variables (request-scoped settings) are visible in workers
+                context = contextvars.copy_context()
+                running[executor.submit(context.run, self._call, stage, runner, kwargs)] = name
+                started[name] = time.perf_counter()
+                remaining.remove(name)
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                outputs[name] = future.result()
+                timings[name] = round((time.perf_counter() - started[name]) * 1000, 1)
+
+        # Every stage has finished, so the threads are idle
+        executor.shutdown(wait=False)
+        return outputs, timings
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "runs": timing["runs"],
+                    "avg_ms": round(timing["seconds"] / timing["runs"] * 1000, 1),
+                    "max_ms": round(timing["max_seconds"] * 1000, 1)
+                }
+                for name, timing in self._timings.items()
+            }
@@ -0,0 +1,333 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400.0
+
+# Tenant the current request is charged to (see TenantMiddleware); copied into worker threads
+current_tenant = contextvars.ContextVar("current_tenant", default="anonymous")
+
+class QuotaExceeded(Exception):
+    """An upstream call refused because a tenant or every key is out of budget.
+
+    Not an upstream failure, so circuit breakers ignore it.
+    """
+
+    def __init__(self, service: str, scope: str):
+        super().__init__(f"{service} quota exceeded for {scope}")
+        self.service = service
+        self.scope = scope
+
+class TokenBucket:
+    """capacity tokens, refilled continuously at rate tokens per second"""
+
+    def __init__(self, capacity: float, rate: float, tokens: float = None, updated: float = None):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity if tokens is None else min(tokens, capacity)
+        self.updated = time.time() if updated is None else updated
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill(time.time())
+        return self.tokens
+
+    def try_take(self, amount: float = 1.0) -> bool:
+        self._refill(time.time())
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+    def give_back(self, amount: float = 1.0):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+def key_label(index: int, key: str) -> str:
+    """Identify a key in reports without exposing it"""
+    return f"key-{index + 1} (...{key[-4:]})" if key else f"key-{index + 1}"
+
+class QuotaManager:
+    """Per-tenant and per-key upstream budgets, enforced with token buckets.
+
+    Each service has a pool of API keys. acquire(service) charges the
+    current tenant's daily budget, then picks the pool key with the most
+    budget left, so load rotates across keys; QuotaExceeded is raised when
+    either runs out, leaving the caller to fall back to cached data. A
+    budget of 0 means unlimited. At most max_tenants tenants are tracked;
+    the least recently seen are forgotten first.
+
+    Budgets are enforced per process. Under the pre-fork launcher each of
+    the `processes` workers gets an equal share of every budget, so together
+    they never exceed it (a tenant served mostly by one worker gets less).
+    State can be written to a local JSON file so budgets survive restarts;
+    that is only done with a single process, since workers would overwrite
+    each other's file.
+    """
+
+    def __init__(self, services: dict, state_path: str = None, save_interval: float = 30,
+                 max_tenants: int = 10000, processes: int = 1):
+        self.processes = max(processes, 1)
+        self.services = {
+            service: {
+                **config,
+                "tenant_daily": config["tenant_daily"] / self.processes,
+                "key_daily": config["key_daily"] / self.processes
+            }
+            for service, config in services.items()
+        }
+        if state_path and self.processes > 1:
+            logger.warning("Quota state is not persisted with multiple worker processes")
+            state_path = None
+        self.state_path = state_path
+        self.save_interval = save_interval
+        self.max_tenants = max_tenants
+        self._lock = threading.Lock()
+        self._tenants = OrderedDict()
+        self._tenant_buckets = {}
+        self._key_buckets = {}
+        self._calls = {}
+        self._rejections = {}
+        self._next_key = {}
+        self._last_save = time.time()
+        self._load()
+
+    def _tenant_bucket(self, service: str, tenant: str):
+        budget = self.services[service]["tenant_daily"]
+        if not budget:
+            return None
+        self._touch(tenant)
+        return self._tenant_buckets.setdefault((service, tenant), TokenBucket(budget, budget / DAY))
+
+    def _touch(self, tenant: str):
+        """Mark tenant as recently seen, forgetting the stalest tenants beyond max_tenants"""
+        self._tenants[tenant] = None
+        self._tenants.move_to_end(tenant)
+        while len(self._tenants) > self.max_tenants:
+            stale, _ = self._tenants.popitem(last=False)
+            for service in self.services:
+                self._tenant_buckets.pop((service, stale), None)
+                for counters in (self._calls, self._rejections):
+                    counters.get(service, {}).get("tenants", {}).pop(stale, None)
+
+    def _key_bucket(self, service: str, index: int):
+        budget = self.services[service]["key_daily"]
+        if not budget:
+            return None
+        return self._key_buckets.setdefault((service, index), TokenBucket(budget, budget / DAY))
+
+    def acquire(self, service: str) -> str:
+        """Charge one call to the current tenant and return the key to use"""
+        tenant = current_tenant.get()
+        keys = self.services[service]["keys"] or [""]
+        with self._lock:
+            tenant_bucket = self._tenant_bucket(service, tenant)
+            if tenant_bucket and not tenant_bucket.try_take():
+                self._count(self._rejections, service, tenant)
+                raise QuotaExceeded(service, f"tenant {tenant}")
+
+            def remaining(index):
+                bucket = self._key_bucket(service, index)
+                return float("inf") if bucket is None else bucket.available()
+
+            # Rotate across keys, preferring the one with the most budget left
+            start = self._next_key.get(service, 0)
+            self._next_key[service] = start + 1
+            index = max([(start + offset) % len(keys) for offset in range(len(keys))], key=remaining)
+            bucket = self._key_bucket(service, index)
+            if bucket and not bucket.try_take():
+                if tenant_bucket:
+                    tenant_bucket.give_back()
+                self._count(self._rejections, service, tenant)
+                raise QuotaExceeded(service, "every key")
+
+            self._count(self._calls, service, tenant, key_label(index, keys[index]))
+            save = self.state_path and time.time() - self._last_save >= self.save_interval
+        if save:
+            self.save()
+        return keys[index]
+
+    def _count(self, counters: dict, service: str, tenant: str, key: str = None):
+        self._touch(tenant)
+        service_counts = counters.setdefault(service, {"tenants": {}, "keys": {}})
+        service_counts["tenants"][tenant] = service_counts["tenants"].get(tenant, 0) + 1
+        if key:
+            service_counts["keys"][key] = service_counts["keys"].get(key, 0) + 1
+
+    def has_budget(self, service: str) -> bool:
+        """Whether the current tenant could make a call to service right now"""
+        with self._lock:
+            bucket = self._tenant_bucket(service, current_tenant.get())
+            return bucket is None or bucket.available() >= 1
+
+    def report(self, tenant: str = None) -> dict:
+        """Consumption and remaining budget per service, optionally for one tenant"""
+        with self._lock:
+            report = {}
+            for service, config in self.services.items():
+                calls = self._calls.get(service, {"tenants": {}, "keys": {}})
+                rejections = self._rejections.get(service, {"tenants": {}})
+                tenants = [tenant] if tenant else sorted(set(calls["tenants"]) | set(rejections["tenants"]))
+                report[service] = {
+                    "tenant_daily_budget": config["tenant_daily"] or None,
+                    "tenants": {
+                        name: {
+                            "calls": calls["tenants"].get(name, 0),
+                            "rejected": rejections["tenants"].get(name, 0),
+                            "remaining": (
+                                round(self._tenant_buckets[(service, name)].available(), 1)
+                                if (service, name) in self._tenant_buckets
+                                else config["tenant_daily"] or None
+                            )
+                        }
+                        for name in tenants
+                    },
+                    "keys": {
+                        key_label(index, key): {
+                            "calls": calls["keys"].get(key_label(index, key), 0),
+                            "remaining": (
+                                round(self._key_bucket(service, index).available(), 1)
+                                if config["key_daily"] else None
+                            )
+                        }
+                        for index, key in enumerate(config["keys"] or [""])
+                    }
+                }
+            return report
+
+    def _load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            for service, tenant, tokens, updated in state.get("tenant_buckets", []):
+                if service in self.services and self.services[service]["tenant_daily"]:
+                    budget = self.services[service]["tenant_daily"]
+                    self._tenant_buckets[(service, tenant)] = TokenBucket(budget, budget / DAY, tokens, updated)
+                    self._touch(tenant)
+            for service, index, tokens, updated in state.get("key_buckets", []):
+                if service in self.services and self.services[service]["key_daily"]:
+                    budget = self.services[service]["key_daily"]
+                    self._key_buckets[(service, index)] = TokenBucket(budget, budget / DAY, tokens, updated)
+            self._calls = state.get("calls", {})
+            self._rejections = state.get("rejections", {})
+        except (OSError, ValueError, TypeError) as e:
+            logger.error("Error loading quota state: %s", e)
+
+    def save(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            state = {
+                "tenant_buckets": [
+                    [service, tenant, bucket.tokens, bucket.updated]
+                    for (service, tenant), bucket in self._tenant_buckets.items()
+                ],
+                "key_buckets": [
+                    [service, index, bucket.tokens, bucket.updated]
+                    for (service, index), bucket in self._key_buckets.items()
+                ],
+                "calls": self._calls,
+                "rejections": self._rejections
+            }
+            self._last_save = time.time()
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.error("Error saving quota state: %s", e)
+
+@contextmanager
+def as_tenant(tenant: str):
+    """Charge upstream calls made inside the block to tenant"""
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+def parse_api_keys(value: str) -> dict:
+    """API key -> tenant mapping from "key:tenant,key:tenant" """
+    api_keys = {}
+    for pair in value.split(","):
+        key, _, tenant = pair.strip().partition(":")
+        if key and tenant:
+            api_keys[key] = tenant.strip()
+    return api_keys
+
+class TenantMiddleware:
+    """Charge each request to a tenant the server can vouch for.
+
+    A request with a configured API key (X-API-Key) belongs to that key's
+    tenant; any other request is charged to its client address
+    ("ip:<addr>"), so one heavy client cannot use up a budget shared by
+    everyone and clients cannot choose their own tenant. Behind a reverse
+    proxy, run uvicorn with --proxy-headers so the address is the client's.
+    """
+
+    def __init__(self, app, api_keys: dict = None, header: str = "x-api-key"):
+        self.app = app
+        self.api_keys = api_keys or {}
+        self.header = header.lower().encode()
+
+    def tenant_for(self, scope) -> str:
+        api_key = next(
+            (value.decode("latin-1").strip() for name, value in scope["headers"] if name == self.header),
+            ""
+        )
+        if api_key in self.api_keys:
+            return self.api_keys[api_key]
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "anonymous"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with as_tenant(self.tenant_for(scope)):
+            await self.app(scope, receive, send)
+
+def key_pool(*names: str) -> list:
+    """API keys from the first set environment variable (comma-separated for a pool)"""
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return [key.strip() for key in value.split(",") if key.strip()]
+    return []
+
+# Create a single instance of QuotaManager
+quota_manager = QuotaManager(
+    {
+        "serpapi": {
+            "keys": key_pool("SERPAPI_KEYS", "duckduckgo"),
+            "tenant_daily": float(os.getenv("QUOTA_SERPAPI_TENANT_DAILY", "500")),
+            "key_daily": float(os.getenv("QUOTA_SERPAPI_KEY_DAILY", "0"))
+        },
+        "gemini": {
+            "keys": key_pool("GOOGLE_API_KEY"),
+            "tenant_daily": float(os.getenv("QUOTA_GEMINI_TENANT_DAILY", "500")),
+            "key_daily": float(os.getenv("QUOTA_GEMINI_KEY_DAILY", "0"))
+        }
+    },
+    state_path=os.getenv("QUOTA_STATE_PATH"),
+    max_tenants=int(os.getenv("QUOTA_MAX_TENANTS", "10000")),
+    processes=int(os.getenv("WEB_CONCURRENCY", "1"))
+)
+atexit.register(quota_manager.save)
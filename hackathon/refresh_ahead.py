@@ -0,0 +1,191 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cache_context import refresh_margin
+
+logger = logging.getLogger(__name__)
+
+class AnalysisCache:
+    """Finished analyses by normalized query, for a limited time"""
+
+    def __init__(self, ttl_seconds: float = 1800, max_entries: int = 500):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, allow_stale: bool = False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[0] <= time.time() and not allow_stale):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def expires_in(self, key: str) -> float:
+        """Seconds until the entry for key expires (0 if there is none)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return max(entry[0] - time.time(), 0.0) if entry else 0.0
+
+    def put(self, key: str, analysis: dict):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, analysis)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class QueryPopularity:
+    """Exponentially decayed request counts per normalized query"""
+
+    def __init__(self, half_life: float = 3600, max_queries: int = 1000):
+        self.half_life = half_life
+        self.max_queries = max_queries
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score: float, since: float, now: float) -> float:
+        return score * math.exp(-math.log(2) * (now - since) / self.half_life)
+
+    def record(self, key: str, query: str):
+        now = time.time()
+        with self._lock:
+            score, since, _ = self._queries.get(key, (0.0, now, query))
+            self._queries[key] = (self._decayed(score, since, now) + 1, now, query)
+            if len(self._queries) > self.max_queries:
+                # Forget the coldest quarter rather than trimming on every call
+                ranked = sorted(self._queries, key=lambda k: self._decayed(*self._queries[k][:2], now))
+                for cold in ranked[:len(ranked) // 4]:
+                    del self._queries[cold]
+
+    def hottest(self, limit: int, min_score: float) -> list:
+        """(key, query, score) of the most requested queries"""
+        now = time.time()
+        with self._lock:
+            scored = [
+                (key, query, self._decayed(score, since, now))
+                for key, (score, since, query) in self._queries.items()
+            ]
+        scored = [entry for entry in scored if entry[2] >= min_score]
+        return sorted(scored, key=lambda entry: entry[2], reverse=True)[:limit]
+
+class RefreshAhead:
+    """Keep popular analyses warm by recomputing them shortly before they expire.
+
+    Every interval, the hottest queries whose cached analysis is missing or
+    expires within the refresh window are re-run through refresh(query), at
+    most budget runs per interval so background work has a fixed upstream
+    cost. Each worker process runs its own scheduler over its own traffic
+    and cache, so the budget is shared out across processes: a worker's
+    share accrues as credit and a run is spent once a whole one is saved.
+    """
+
+    def __init__(self, cache: AnalysisCache, popularity: QueryPopularity, refresh=None,
+                 interval: float = 60, window: float = 300, budget: int = 5, hot_queries: int = 200,
+                 min_score: float = 3.0, processes: int = 1):
+        self.cache = cache
+        self.popularity = popularity
+        self.refresh = refresh
+        self.interval = interval
+        self.window = window
+        self.budget = budget / max(processes, 1)
+        self.hot_queries = hot_queries
+        self.min_score = min_score
+        self._credit = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self.cycles = 0
+        self.refreshed = 0
+        self.failed = 0
+
+    def due(self, limit: int = None) -> list:
+        """Hot (key, query) pairs whose cached analysis needs refreshing now, at most limit"""
+        limit = limit if limit is not None else max(int(self.budget), 1)
+        due = []
+        for key, query, _ in self.popularity.hottest(self.hot_queries, self.min_score):
+            if len(due) >= limit:
+                break
+            if self.cache.expires_in(key) <= self.window:
+                due.append((key, query))
+        return due
+
+    def run_once(self):
+        self.cycles += 1
+        # Unused credit is capped just above one interval's share, so idle time does not bank a burst
+        self._credit = min(self._credit + self.budget, self.budget + 1)
+        for key, query in self.due(int(self._credit)):
+            if self._stop.is_set():
+                return
+            self._credit -= 1
+            token = refresh_margin.set(self.window)
+            try:
+                analysis = self.refresh(query)
+                if not analysis or analysis.get("error"):
+                    raise RuntimeError(analysis.get("message", "empty analysis") if analysis else "empty analysis")
+                self.cache.put(key, analysis)
+                self.refreshed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Refresh-ahead failed for %r: %.200s", query, e)
+            finally:
+                refresh_margin.reset(token)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Refresh-ahead cycle failed: %s", e)
+
+    def start(self):
+        if self._thread is None and self.refresh is not None and self.budget > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="refresh-ahead", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None,
+            "cycles": self.cycles,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "budget_per_interval": round(self.budget, 3),
+            "due": len(self.due())
+        }
+
+# Create single instances of the analysis cache, popularity tracker and scheduler
+analysis_cache = AnalysisCache(
+    ttl_seconds=float(os.getenv("ANALYSIS_CACHE_TTL", "1800")),
+    max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", "500"))
+)
+query_popularity = QueryPopularity(half_life=float(os.getenv("POPULARITY_HALF_LIFE", "3600")))
+refresh_ahead = RefreshAhead(
+    analysis_cache,
+    query_popularity,
+    interval=float(os.getenv("REFRESH_AHEAD_INTERVAL", "60")),
+    window=float(os.getenv("REFRESH_AHEAD_WINDOW", "300")),
+    budget=int(os.getenv("REFRESH_AHEAD_BUDGET", "5")),
+    min_score=float(os.getenv("REFRESH_AHEAD_MIN_SCORE", "3")),
+    processes=int(os.getenv("WEB_CONCURRENCY", "1"))
+)
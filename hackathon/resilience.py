@@ -0,0 +1,157 @@
+import logging
+import os
+import threading
+import time
+
+from quota import QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+# Overall time allowed for one analysis, and the most any single upstream
+# stage may take out of it (seconds)
+ANALYZE_DEADLINE = float(os.getenv("ANALYZE_DEADLINE", "45"))
+STAGE_BUDGETS = {
+    "trends": float(os.getenv("STAGE_BUDGET_TRENDS", "10")),
+    "serpapi": float(os.getenv("STAGE_BUDGET_SERPAPI", "10")),
+    "youtube": float(os.getenv("STAGE_BUDGET_YOUTUBE", "8")),
+    "gemini": float(os.getenv("STAGE_BUDGET_GEMINI", "30")),
+    "reddit": float(os.getenv("STAGE_BUDGET_REDDIT", "8")),
+    "quora": float(os.getenv("STAGE_BUDGET_QUORA", "8")),
+}
+# Stages are skipped rather than started with less time than this
+MIN_STAGE_BUDGET = float(os.getenv("MIN_STAGE_BUDGET", "1"))
+
+class Deadline:
+    """A point in time by which a request must be finished"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def budget(self, cap: float) -> float:
+        """Time available for the next stage: its own cap or whatever is left"""
+        return min(cap, self.remaining())
+
+class CircuitBreaker:
+    """Fail fast on an upstream after repeated errors, probing for recovery.
+
+    closed -> open after failure_threshold consecutive failures; open ->
+    half_open once reset_timeout has passed, letting a single probe call
+    through; the probe closes the circuit on success or re-opens it on failure.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def release_probe(self):
+        """Give back a half-open probe slot for a call that never reached the upstream"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Circuit %s closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                    logger.warning("Circuit %s opened after %s failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+            "trips": self.trips
+        }
+
+breakers = {
+    name: CircuitBreaker(
+        name,
+        failure_threshold=int(os.getenv("BREAKER_FAILURES", "3")),
+        reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+    )
+    for name in STAGE_BUDGETS
+}
+
+class StageRunner:
+    """Run upstream calls for one request under its deadline and breakers.
+
+    Each call receives a ``timeout`` keyword with its share of the remaining
+    time. Calls that are skipped or fail return the given default and are
+    recorded in ``skipped`` so the response can say which sources are missing.
+    """
+
+    def __init__(self, deadline: Deadline = None):
+        self.deadline = deadline or Deadline(ANALYZE_DEADLINE)
+        self.skipped = []
+        self._lock = threading.Lock()
+
+    def _skip(self, source: str, reason: str):
+        logger.warning("Skipping %s: %s", source, reason)
+        with self._lock:
+            self.skipped.append({"source": source, "reason": reason})
+
+    def run(self, source: str, func, *args, default=None, **kwargs):
+        timeout = self.deadline.budget(STAGE_BUDGETS.get(source, self.deadline.seconds))
+        if timeout < MIN_STAGE_BUDGET:
+            self._skip(source, "deadline exhausted")
+            return default
+
+        breaker = breakers.get(source)
+        if breaker and not breaker.allow():
+            self._skip(source, "circuit open")
+            return default
+
+        try:
+            result = func(*args, timeout=timeout, **kwargs)
+        except QuotaExceeded as e:
+            # The upstream is fine; this tenant is out of budget
+            if breaker:
+                breaker.release_probe()
+            self._skip(source, str(e))
+            return default
+        except Exception as e:
+            if breaker:
+                breaker.record_failure()
+            self._skip(source, f"error: {str(e)[:200]}")
+            return default
+
+        if breaker:
+            breaker.record_success()
+        return result
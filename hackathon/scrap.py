@@ -2,131 +2,204 @@ import requests
 import os
 from dotenv import load_dotenv
 import time
-from pytrends.request import TrendReq
-import spacy
-from textblob import TextBlob
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import pandas as pd
-import google.generativeai as genai
+from functools import lru_cache
 from typing import List, Dict
 import json
-from bs4 import BeautifulSoup
 import re
+import uuid
 from urllib.parse import quote_plus
 from db import db_manager
+from cpu_pool import cpu_pool
+from resilience import StageRunner
+from trend_store import trend_store
+from competitor_search import competitor_search, merge_results
+from stage_cache import stage_cache
+from pipeline import Pipeline, Stage
+from quota import quota_manager
+from structured_insights import INSIGHTS_SCHEMA, InsightsStreamParser, render_markdown, structured_prompt_fields
+from social_collectors import quora_collector, rank_posts, reddit_collector
+from log_config import configure_logging, log_payload
 import logging
 from datetime import datetime
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Default timeout for upstream HTTP calls made outside a request deadline
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "15"))
+# Result pages searched per keyword when composing competitor results
+COMPETITOR_KEYWORD_PAGES = int(os.getenv("COMPETITOR_KEYWORD_PAGES", "1"))
+# Threads available to run independent analysis stages in parallel
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "16"))
+# Weeks of Google Trends history returned with each analysis
+TREND_WEEKS = int(os.getenv("TREND_WEEKS", "52"))
+# Ask Gemini for schema-conformant JSON insights (needs a model with JSON output mode)
+STRUCTURED_INSIGHTS = os.getenv("STRUCTURED_INSIGHTS", "1") == "1"
+INSIGHTS_MODEL = os.getenv("INSIGHTS_MODEL", "gemini-1.5-flash" if STRUCTURED_INSIGHTS else "gemini-pro")
+AI_INSIGHTS_UNAVAILABLE = "AI insights are unavailable right now. Please try again shortly."
+
+QUESTION_WORDS = {"how", "what", "why", "which", "where", "when", "who", "is", "are", "can", "should", "does", "do"}
+
+def interleave(lists):
+    """Round-robin the items of several ranked lists into one"""
+    lists = [list(items) for items in lists]
+    return [items[i] for i in range(max(map(len, lists), default=0)) for items in lists if i < len(items)]
+
+# Heavy NLP/analytics libraries are imported on first use so that importing
+# this module (and the server) stays fast
+
 # Load spaCy's small English model
-nlp = spacy.load('en_core_web_sm')
+@lru_cache(maxsize=None)
+def get_nlp():
+    import spacy
+    return spacy.load('en_core_web_sm')
 
 # Initialize Google Trends API
-pytrends = TrendReq(hl='en-US', tz=360)
+@lru_cache(maxsize=None)
+def get_pytrends():
+    from pytrends.request import TrendReq
+    return TrendReq(hl='en-US', tz=360)
 
 # Function to extract keywords from business owner input
 def extract_keywords(text):
-    doc = nlp(text)
-    # Filter out duplicates and limit to most relevant keywords
-    keywords = list(set([token.text.lower() for token in doc 
-                        if token.pos_ in ['NOUN', 'PROPN'] 
-                        and not token.is_stop]))[:5]
+    doc = get_nlp()(text)
+    # Filter out duplicates (keeping first-seen order, so the same text always
+    # gives the same keywords) and limit to most relevant keywords
+    keywords = list(dict.fromkeys([token.text.lower() for token in doc 
+                                   if token.pos_ in ['NOUN', 'PROPN'] 
+                                   and not token.is_stop]))[:5]
     return keywords
 
-# Function to search DuckDuckGo and gather competitor data
-def search_duckduckgo(query):
-    api_key = os.getenv("duckduckgo")  # Load your API key from the environment
+# One page of DuckDuckGo results through SerpAPI (raises on failure)
+def fetch_competitor_page(query, offset=0, count=30, timeout=None):
+    # Charged to the requesting tenant; keys rotate across the duckduckgo/SERPAPI_KEYS pool
+    api_key = quota_manager.acquire("serpapi")
     url = "https://serpapi.com/search"
     
     params = {
         'api_key': api_key,
         'engine': 'duckduckgo',
         'q': query,
-        'num': 30  # Request more results to ensure we get at least 20
+        'start': offset,
+        'num': count
     }
     
-    try:
-        print(f"Searching for: {query}")
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            results = []
-            
-            # Extract organic results
-            for result in data.get('organic_results', []):
-                summary = result.get('snippet', '')
-                if result.get('description'):
-                    summary += ' ' + result.get('description', '')
-                
-                results.append({
-                    'title': result.get('title', ''),
-                    'snippet': summary,
-                    'link': result.get('link', ''),
-                    'displayed_link': result.get('displayed_link', ''),
-                    'date': result.get('date', '')
-                })
-                
-                if len(results) >= 25:
-                    break
-            
-            print(f"Found {len(results)} results")
-            return results
-        else:
-            print(f"Request failed with status code: {response.status_code}")
-            print(f"Error message: {response.text[:200]}")
-            return []
-    except Exception as e:
-        print(f"Error occurred: {e}")
-        return []
+    response = requests.get(url, params=params, timeout=timeout or REQUEST_TIMEOUT)
+    
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"Request failed with status code: {response.status_code}: {response.text[:200]}"
+        )
+    
+    data = response.json()
+    results = []
+    
+    # Extract organic results
+    for result in data.get('organic_results', []):
+        summary = result.get('snippet', '')
+        if result.get('description'):
+            summary += ' ' + result.get('description', '')
+        
+        results.append({
+            'title': result.get('title', ''),
+            'snippet': summary,
+            'link': result.get('link', ''),
+            'displayed_link': result.get('displayed_link', ''),
+            'date': result.get('date', '')
+        })
+    
+    return results
+
+# Function to search DuckDuckGo and gather competitor data (raises on failure).
+# Several result pages are fetched in parallel, deduplicated and ranked.
+def fetch_competitor_results(query, timeout=None):
+    logger.info("Searching for: %s", query)
+    results = competitor_search.search(query, fetch_competitor_page, timeout=timeout or REQUEST_TIMEOUT)
+    logger.info("Found %d results", len(results))
+    return results
+
+# Competitor results composed from per-keyword searches, so a refined query
+# only searches for the keywords it does not share with earlier ones; with no
+# keyword cached, one combined search is cheaper and more relevant
+def fetch_keyword_competitors(keyword, timeout=None):
+    return competitor_search.search(
+        keyword, fetch_competitor_page, timeout=timeout or REQUEST_TIMEOUT, page_count=COMPETITOR_KEYWORD_PAGES
+    )
+
+def fetch_competitors_by_keyword(keywords, timeout=None, reuse=None):
+    per_keyword = stage_cache.compose("serpapi", keywords, fetch_keyword_competitors, timeout, reuse,
+                                      combined=fetch_competitor_results)
+    # Interleaving ranks every keyword's top results ahead of any keyword's tail
+    results = merge_results([interleave(per_keyword.values())])
+    logger.info("Found %d results", len(results))
+    return results
+
+# One upstream Google Trends request for a timeframe (raises on failure)
+def fetch_trends_window(keywords, timeframe, timeout=None):
+    import numpy as np
+    
+    pytrends = get_pytrends()
+    pytrends.timeout = (timeout or REQUEST_TIMEOUT, timeout or REQUEST_TIMEOUT)
+    pytrends.build_payload(keywords, cat=0, timeframe=timeframe, geo='', gprop='')
+    trends_data = pytrends.interest_over_time()
+    
+    if trends_data.empty:
+        return np.array([], dtype='datetime64[D]'), {}
+    dates = trends_data.index.values.astype('datetime64[D]')
+    return dates, {
+        keyword: trends_data[keyword].to_numpy(dtype=float)
+        for keyword in keywords if keyword in trends_data.columns
+    }
 
-# Function to get Google Trends data for extracted keywords
-def get_google_trends_data(keywords):
+# Function to get Google Trends data for extracted keywords (raises on failure).
+# History is kept per keyword in the trend store, so only recent weeks are fetched.
+def fetch_trends_data(keywords, timeout=None, weeks=TREND_WEEKS, reuse=None):
+    import pandas as pd
+    
     # Limit to 5 keywords maximum
     keywords = keywords[:5]
-    
-    try:
-        pytrends.build_payload(keywords, cat=0, timeframe='today 12-m', geo='', gprop='')
-        trends_data = pytrends.interest_over_time()
-        
-        # Convert all numeric data to native Python types
-        if not trends_data.empty:
-            # Convert int64/float64 to native Python types
-            trends_data = trends_data.astype(float)
-            # Drop isPartial column as it's not needed
-            if 'isPartial' in trends_data.columns:
-                trends_data = trends_data.drop('isPartial', axis=1)
-            print("Google Trends Data Retrieved Successfully")
-        else:
-            print("No trends data available.")
-        
-        return trends_data
-    except Exception as e:
-        logger.error(f"Error getting trends data: {e}")
+    if not keywords:
         return pd.DataFrame()
+    
+    report = {}
+    dates, series = trend_store.get(keywords, fetch_trends_window, weeks=weeks, timeout=timeout, report=report)
+    stage_cache.record("trends", report["reused"], report["fetched"], reuse)
+    
+    if len(dates):
+        trends_data = pd.DataFrame(series, index=pd.DatetimeIndex(dates, name='date'))
+        # "shared" unless the store had to fall back to histories on different bases
+        trends_data.attrs["scale"] = "shared" if report["shared_scale"] else "per_keyword"
+        logger.info("Google Trends data retrieved successfully")
+    else:
+        trends_data = pd.DataFrame()
+        logger.info("No trends data available")
+    
+    return trends_data
 
 # Function to analyze the sentiment of the text (competitor ads, snippets, etc.)
 def analyze_sentiment(text):
+    from textblob import TextBlob
     blob = TextBlob(text)
     return blob.sentiment.polarity  # Returns sentiment polarity (-1 to 1)
 
+def analyze_sentiment_batch(texts):
+    return [analyze_sentiment(text) for text in texts]
+
+# Score many texts on the CPU pool instead of the request thread
+def score_sentiments(texts):
+    batches = cpu_pool.map_batches(analyze_sentiment_batch, list(texts), batch_size=32)
+    return [score for batch in batches for score in batch]
+
 # Function to create a word cloud of frequent terms
-def generate_wordcloud(texts):
-    text = " ".join(texts)
-    wordcloud = WordCloud(width=800, height=400, background_color='white').generate(text)
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation='bilinear')
-    plt.axis('off')
-    plt.show()
+# (rendered headlessly; returns the image bytes instead of opening a window)
+def generate_wordcloud(texts, fmt="png"):
+    from wordcloud_service import render_wordcloud, term_frequencies
+    
+    frequencies = term_frequencies(texts)
+    if not frequencies:
+        return None
+    return render_wordcloud(frequencies, fmt)
 
 # Function to format result text
 def format_result(text, max_length=300):
@@ -163,76 +236,215 @@ def display_results(results, trends_data):
 
         # Generate Word Cloud of Common Words
         snippets = [result['snippet'] for result in results]
-        generate_wordcloud(snippets)
+        image = generate_wordcloud(snippets)
+        if image:
+            with open("wordcloud.png", "wb") as f:
+                f.write(image)
+            print("\nWord cloud saved to wordcloud.png")
 
 # Configure Gemini
-def setup_gemini():
+def setup_gemini(model_name='gemini-pro'):
+    import google.generativeai as genai
     GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") # Add this to your .env file
     genai.configure(api_key=GOOGLE_API_KEY)
-    return genai.GenerativeModel('gemini-pro')
-
-def scrape_youtube(query, num_results=5):
-    """Scrape YouTube search results including video details."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
+    return genai.GenerativeModel(model_name)
+
+YOUTUBE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0.0.0 Safari/537.36',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+# Markers used to locate the pieces of the results page we actually need,
+# without parsing the whole HTML document or the full ytInitialData blob
+_YT_INITIAL_DATA_MARKER = 'var ytInitialData = '
+_YT_INITIAL_DATA_END = ';</script>'
+_YT_SECTION_RE = re.compile(r'"itemSectionRenderer"\s*:\s*\{\s*"contents"\s*:\s*')
+_YT_CONTINUATION_RE = re.compile(
+    r'"continuationItemRenderer"\s*:.*?"continuationCommand"\s*:\s*\{\s*"token"\s*:\s*"([^"]+)"',
+    re.S
+)
+_YT_API_KEY_RE = re.compile(r'"INNERTUBE_API_KEY"\s*:\s*"([^"]+)"')
+_YT_CLIENT_VERSION_RE = re.compile(r'"INNERTUBE_CLIENT_VERSION"\s*:\s*"([^"]+)"')
+_json_decoder = json.JSONDecoder()
+
+def _iter_yt_sections(text, start=0, end=None):
+    """Yield the decoded itemSectionRenderer contents lists found in text"""
+    end = len(text) if end is None else end
+    pos = start
+    while True:
+        match = _YT_SECTION_RE.search(text, pos, end)
+        if not match:
+            return
+        try:
+            # Decode just this contents array and resume scanning after it
+            contents, pos = _json_decoder.raw_decode(text, match.end())
+        except ValueError:
+            pos = match.end()
+            continue
+        if isinstance(contents, list):
+            yield contents
+
+def _parse_video_renderer(video_info):
+    """Convert a videoRenderer object into our compact video record"""
+    return {
+        'title': video_info.get('title', {}).get('runs', [{}])[0].get('text', ''),
+        'url': f"https://youtube.com/watch?v={video_info.get('videoId', '')}",
+        'channel_name': video_info.get('ownerText', {}).get('runs', [{}])[0].get('text', ''),
+        'description': video_info.get('descriptionSnippet', {}).get('runs', [{}])[0].get('text', ''),
+        'views': video_info.get('viewCountText', {}).get('simpleText', '0 views'),
+        'duration': video_info.get('lengthText', {}).get('simpleText', 'N/A'),
+        'published': video_info.get('publishedTimeText', {}).get('simpleText', 'N/A'),
     }
+
+def _extract_yt_page(text, start=0, end=None):
+    """Extract videos and the next continuation token from a page of results"""
+    end = len(text) if end is None else end
+    videos = []
+    for contents in _iter_yt_sections(text, start, end):
+        for item in contents:
+            video_info = item.get('videoRenderer') if isinstance(item, dict) else None
+            if not video_info:
+                continue
+            try:
+                videos.append((video_info.get('videoId', ''), _parse_video_renderer(video_info)))
+            except Exception as e:
+                logger.warning("Error parsing video data: %s", e)
     
-    try:
-        url = f'https://www.youtube.com/results?search_query={quote_plus(query)}'
-        print(f"Searching YouTube for: {query}")
-        
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        script_tag = soup.find('script', string=re.compile('var ytInitialData = '))
-        
-        if not script_tag:
-            return []
-            
-        data_text = re.search(r'var ytInitialData = (.+?);</script>', str(script_tag)).group(1)
-        data = json.loads(data_text)
-        
-        videos = []
-        video_data = data.get('contents', {}).get('twoColumnSearchResultsRenderer', {}).get('primaryContents', {}).get('sectionListRenderer', {}).get('contents', [{}])[0].get('itemSectionRenderer', {}).get('contents', [])
-        
-        for video in video_data:
-            if 'videoRenderer' in video:
-                video_info = video['videoRenderer']
-                try:
-                    video_data = {
-                        'title': video_info.get('title', {}).get('runs', [{}])[0].get('text', ''),
-                        'url': f"https://youtube.com/watch?v={video_info.get('videoId', '')}",
-                        'channel_name': video_info.get('ownerText', {}).get('runs', [{}])[0].get('text', ''),
-                        'description': video_info.get('descriptionSnippet', {}).get('runs', [{}])[0].get('text', ''),
-                        'views': video_info.get('viewCountText', {}).get('simpleText', '0 views'),
-                        'duration': video_info.get('lengthText', {}).get('simpleText', 'N/A'),
-                        'published': video_info.get('publishedTimeText', {}).get('simpleText', 'N/A'),
-                    }
-                    videos.append(video_data)
-                    
-                    if len(videos) >= num_results:
-                        break
-                except Exception as e:
-                    print(f"Error parsing video data: {str(e)}")
-                    continue
-        
-        return videos
-        
-    except Exception as e:
-        print(f"Error fetching YouTube results: {str(e)}")
+    # The section-level continuation comes last, after all result sections
+    token = None
+    for match in _YT_CONTINUATION_RE.finditer(text, start, end):
+        token = match.group(1)
+    return videos, token
+
+def _locate_yt_initial_data(html):
+    """Return the (start, end) offsets of the ytInitialData payload, or None"""
+    start = html.find(_YT_INITIAL_DATA_MARKER)
+    if start == -1:
+        return None
+    start += len(_YT_INITIAL_DATA_MARKER)
+    end = html.find(_YT_INITIAL_DATA_END, start)
+    return start, (end if end != -1 else len(html))
+
+def fetch_youtube_videos(query, num_results=5, max_pages=5, timeout=None):
+    """Fetch YouTube search results including video details, raising on failure.
+    
+    The ytInitialData payload is located by scanning the raw page text, and only
+    the itemSectionRenderer contents are decoded. When more than one page of
+    results is needed, continuation tokens are followed through the innertube
+    search API, up to max_pages pages in total.
+    """
+    url = f'https://www.youtube.com/results?search_query={quote_plus(query)}'
+    logger.info("Searching YouTube for: %s", query)
+
+    # The timeout covers the whole multi-page fetch, not each request
+    stop_at = time.monotonic() + (timeout or REQUEST_TIMEOUT)
+    
+    session = requests.Session()
+    session.headers.update(YOUTUBE_HEADERS)
+    response = session.get(url, timeout=timeout or REQUEST_TIMEOUT)
+    response.raise_for_status()
+    html = response.text
+
+    bounds = _locate_yt_initial_data(html)
+    if not bounds:
         return []
 
-def analyze_with_gemini(model, competitor_results, trends_data, keywords: List[str]):
+    videos = []
+    seen_ids = set()
+
+    def collect(page_videos):
+        for video_id, video in page_videos:
+            if video_id in seen_ids:
+                continue
+            seen_ids.add(video_id)
+            videos.append(video)
+            if len(videos) >= num_results:
+                return True
+        return False
+
+    page_videos, token = _extract_yt_page(html, *bounds)
+    done = collect(page_videos)
+
+    api_key = _YT_API_KEY_RE.search(html)
+    client_version = _YT_CLIENT_VERSION_RE.search(html)
+    pages = 1
+    while not done and token and api_key and client_version and pages < max_pages:
+        # Return what we have rather than overrun the time budget
+        remaining = stop_at - time.monotonic()
+        if remaining <= 0:
+            break
+        payload = {
+            'context': {
+                'client': {
+                    'clientName': 'WEB',
+                    'clientVersion': client_version.group(1),
+                    'hl': 'en',
+                    'gl': 'US'
+                }
+            },
+            'continuation': token
+        }
+        response = session.post(
+            'https://www.youtube.com/youtubei/v1/search',
+            params={'key': api_key.group(1), 'prettyPrint': 'false'},
+            json=payload,
+            timeout=remaining
+        )
+        response.raise_for_status()
+        pages += 1
+
+        page_videos, token = _extract_yt_page(response.text)
+        if not page_videos:
+            break
+        done = collect(page_videos)
+
+    return videos
+
+def fetch_keyword_videos(keyword, timeout=None):
+    return fetch_youtube_videos(keyword, timeout=timeout)
+
+# YouTube results composed from cached per-keyword searches (one combined search on a cold miss)
+def fetch_youtube_by_keyword(keywords, num_results=5, timeout=None, reuse=None):
+    per_keyword = stage_cache.compose("youtube", keywords, fetch_keyword_videos, timeout, reuse,
+                                      combined=fetch_keyword_videos)
+    videos = []
+    seen = set()
+    for video in interleave(per_keyword.values()):
+        if video.get('url') not in seen:
+            seen.add(video.get('url'))
+            videos.append(video)
+    return videos[:num_results]
+
+# Reddit discussions, collected per keyword and ranked by engagement
+def fetch_reddit_by_keyword(keywords, num_results=10, timeout=None, reuse=None):
+    per_keyword = stage_cache.compose("reddit", keywords, reddit_collector.search, timeout, reuse)
+    return rank_posts([post for posts in per_keyword.values() for post in posts], num_results)
+
+# Quora questions carry no engagement counts, so they keep search rank
+def fetch_quora_by_keyword(keywords, num_results=10, timeout=None, reuse=None):
+    per_keyword = stage_cache.compose("quora", keywords, quora_collector.search, timeout, reuse)
+    posts = []
+    seen = set()
+    for post in interleave(per_keyword.values()):
+        if post["url"] not in seen:
+            seen.add(post["url"])
+            posts.append(post)
+    return posts[:num_results]
+
+def build_analysis_prompt(competitor_results, trends_data, keywords: List[str], structured: bool = STRUCTURED_INSIGHTS):
     # Prepare the data for analysis
-    if not trends_data.empty:
+    if trends_data is not None and not trends_data.empty:
         trends_dict = {
             "trend_values": {
                 keyword: trends_data[keyword].tolist() 
                 for keyword in keywords if keyword in trends_data.columns
             },
-            "dates": [str(d) for d in trends_data.index]
+            "dates": [str(d) for d in trends_data.index],
+            "scale": (
+                "one 0-100 scale shared by all keywords"
+                if trends_data.attrs.get("scale") == "shared"
+                else "each keyword on its own 0-100 scale; compare shapes, not levels"
+            )
         }
     else:
         trends_dict = {"trend_values": {}, "dates": []}
@@ -254,13 +466,20 @@ def analyze_with_gemini(model, competitor_results, trends_data, keywords: List[s
     
     business_type = "shoes" if "shoes" in [k.lower() for k in keywords] else "business"
     
-    prompt = f"""
+    header = f"""
     As ART Finder (Automated Research and Trigger Finder), analyze the market data and provide comprehensive insights for creating effective ads.
     Focus on these keywords: {', '.join(keywords)}
 
     Context:
     {json.dumps(context, indent=2)}
-
+"""
+    if structured:
+        # The report layout comes from the response schema instead of markdown instructions
+        return f"""{header}
+    {structured_prompt_fields()}
+    """
+    
+    prompt = f"""{header}
     Please provide a detailed markdown-formatted analysis following the ART Finder framework:
 
     # Market Research Analysis
@@ -324,97 +543,38 @@ def analyze_with_gemini(model, competitor_results, trends_data, keywords: List[s
     Include specific examples, metrics, and templates where possible.
     """
     
+    return prompt
+
+def generate_insights_text(model, prompt, timeout=None):
+    """Run an analysis prompt through Gemini, raising on failure"""
+    request_options = {"timeout": timeout} if timeout else None
+    response = model.generate_content(prompt, request_options=request_options)
+    return response.text
+
+def generate_structured_insights(model, prompt, timeout=None):
+    """Stream a JSON-mode analysis from Gemini, parsing items as they arrive"""
+    request_options = {"timeout": timeout} if timeout else None
+    response = model.generate_content(
+        prompt,
+        generation_config={"response_mime_type": "application/json", "response_schema": INSIGHTS_SCHEMA},
+        request_options=request_options,
+        stream=True
+    )
+    parser = InsightsStreamParser()
     try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        logger.error(f"Error generating insights: {e}")
-        return str(e)
-
-def generate_insights_dashboard(results, trends_data, keywords):
-    """Generate a comprehensive insights dashboard in JSON format"""
-    try:
-        print("🔍 Starting insights generation...")  # Console log
-        
-        # Calculate high-level metrics
-        total_results = len(results)
-        sentiments = [analyze_sentiment(result['snippet']) for result in results]
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        
-        # Get AI insights
-        model = setup_gemini()
-        ai_insights = analyze_with_gemini(model, results, trends_data, keywords)
-        
-        # Convert trends data to JSON-serializable format
-        if not trends_data.empty:
-            trends_dict = {
-                "data": trends_data.reset_index().to_dict(orient='records'),
-                "keywords": keywords
-            }
-            # Convert datetime objects to string format
-            for record in trends_dict["data"]:
-                record["date"] = record["date"].strftime("%Y-%m-%d")
-        else:
-            trends_dict = {"data": [], "keywords": keywords}
-        
-        # Create response data
-        dashboard_data = {
-            "metadata": {
-                "total_sources": total_results,
-                "market_sentiment": {
-                    "score": round(avg_sentiment, 2),
-                    "label": "Positive" if avg_sentiment > 0 else "Negative"
-                },
-                "key_topics": keywords
-            },
-            "ai_insights": ai_insights,
-            "trend_analysis": {
-                "google_trends": trends_dict
-            },
-            "competitor_analysis": [
-                {
-                    "title": result['title'],
-                    "summary": format_result(result['snippet'], 150),
-                    "url": result['link'],
-                    "sentiment": round(analyze_sentiment(result['snippet']), 2)
-                } for result in results[:5]
-            ]
-        }
-
-        print("📊 Dashboard data generated successfully")  # Console log
-
-        # Insert into database
-        try:
-            print("💾 Attempting to save to database...")  # Console log
-            formatted_data = {
-                "query": " ".join(keywords),
-                "timestamp": datetime.now().isoformat(),
-                "analysis": dashboard_data,
-                "charts_data": prepare_chart_data(dashboard_data)
-            }
-            
-            # Debug print the data being sent to database
-            print("📝 Data being sent to database:")
-            print(json.dumps(formatted_data, indent=2))
-            
-            result = db_manager.insert_document(formatted_data)
-            if result:
-                print("✅ Successfully saved to database")
-            else:
-                print("❌ Failed to save to database")
-                print("Database result:", result)
-        except Exception as db_error:
-            print(f"❌ Database error: {str(db_error)}")
-            print(f"Error type: {type(db_error)}")
-            print(f"Error details: {str(db_error)}")
-        
-        return dashboard_data
-        
+        for chunk in response:
+            parser.feed(chunk.text)
     except Exception as e:
-        print(f"❌ Error in generate_insights_dashboard: {str(e)}")
-        print(f"Error type: {type(e)}")
-        print(f"Error details: {str(e)}")
-        return None
+        # A timeout or error mid-stream keeps the items already parsed
+        if not any(parser.fields.values()):
+            raise
+        logger.warning("Structured insights stream failed (%s); keeping parsed items", e)
+    if not any(parser.fields.values()):
+        raise ValueError("Gemini returned no structured insights")
+    if not parser.complete:
+        # Keep what was parsed rather than paying for a retry
+        logger.warning("Structured insights stream ended early; using %d parsed fields", len(parser.fields))
+    return parser.fields
 
 def prepare_chart_data(analysis):
     """Prepare chart-friendly data from analysis"""
@@ -456,92 +616,30 @@ def prepare_chart_data(analysis):
         }
         return charts_data
     except Exception as e:
-        logger.error(f"Error preparing chart data: {str(e)}")
+        logger.error("Error preparing chart data: %s", e)
         return {}
 
-def extract_insights_from_ai_response(ai_text: str):
-    """Extract pain points, triggers, and templates from AI response"""
-    try:
-        pain_points = []
-        triggers = []
-        ad_templates = []
-        
-        # Split the text into sections
-        sections = ai_text.split('#')
-        for section in sections:
-            if 'Pain Points & Triggers' in section:
-                # Extract pain points and triggers
-                lines = section.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith('- '):
-                        if 'pain' in line.lower() or 'problem' in line.lower():
-                            pain_points.append(line[2:])
-                        if 'trigger' in line.lower() or 'emotion' in line.lower():
-                            triggers.append(line[2:])
-            
-            if 'Ad Campaign Framework' in section:
-                # Extract ad templates
-                lines = section.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith('- ') and ('headline' in line.lower() or 'template' in line.lower()):
-                        ad_templates.append(line[2:])
-
-        # Ensure we have at least some default values if extraction fails
-        if not pain_points:
-            pain_points = [
-                "Price sensitivity",
-                "Product availability",
-                "Customer service",
-                "Quality concerns",
-                "Delivery time"
-            ]
-        
-        if not triggers:
-            triggers = [
-                "FOMO",
-                "Social proof",
-                "Limited time offers",
-                "Exclusive deals",
-                "Pain point solutions"
-            ]
-        
-        if not ad_templates:
-            ad_templates = [
-                "Problem-Solution",
-                "Before-After",
-                "Customer Story",
-                "Product Showcase",
-                "Social Proof"
-            ]
-
-        return pain_points[:5], triggers[:5], ad_templates[:5]
-    except Exception as e:
-        logger.error(f"Error extracting insights: {e}")
-        return [], [], []
-
 def scrape_social_data(keywords):
     """Scrape data from multiple social platforms"""
-    try:
-        # YouTube data
-        youtube_data = scrape_youtube(" ".join(keywords))
-        
-        # Reddit data (using Reddit API)
-        reddit_data = scrape_reddit(keywords)
-        
-        # Quora data (using web scraping)
-        quora_data = scrape_quora(keywords)
-        
-        # Combine all social data
-        return {
-            "youtube": youtube_data,
-            "reddit": reddit_data,
-            "quora": quora_data
-        }
-    except Exception as e:
-        logger.error(f"Error scraping social data: {e}")
-        return {}
+    outputs, _ = analysis_pipeline.run(["social_data"], {"keywords": keywords, "reuse": {}})
+    return outputs["social_data"]
+
+def parse_view_count(views):
+    """Turn YouTube's "1,234,567 views" text into a number"""
+    if isinstance(views, (int, float)):
+        return int(views)
+    digits = re.sub(r"[^0-9]", "", str(views))
+    return int(digits) if digits else 0
+
+def video_format(video):
+    """Short-form or long-form, from the video's duration text"""
+    parts = [part for part in str(video.get("duration", "")).split(":") if part.isdigit()]
+    if not parts:
+        return "video"
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return "short" if seconds <= 60 else "video" if seconds <= 1200 else "long-form"
 
 def analyze_content_patterns(social_data):
     """Analyze content patterns across platforms"""
@@ -557,21 +655,40 @@ def analyze_content_patterns(social_data):
         # Analyze YouTube content
         for video in social_data.get("youtube", []):
             # Extract video metrics
-            patterns["content_types"][video["type"]] = patterns["content_types"].get(video["type"], 0) + 1
-            patterns["engagement_metrics"]["views"] = patterns["engagement_metrics"].get("views", 0) + video.get("views", 0)
+            content_type = video.get("type") or video_format(video)
+            patterns["content_types"][content_type] = patterns["content_types"].get(content_type, 0) + 1
+            patterns["engagement_metrics"]["views"] = (
+                patterns["engagement_metrics"].get("views", 0) + parse_view_count(video.get("views", 0))
+            )
             
-        # Analyze Reddit and Quora content
-        for platform in ["reddit", "quora"]:
+        patterns["popular_formats"] = sorted(
+            patterns["content_types"], key=patterns["content_types"].get, reverse=True
+        )
+            
+        # Analyze Reddit content (Quora results have no vote counts)
+        for platform in ["reddit"]:
             for post in social_data.get(platform, []):
                 # Extract post patterns
-                if post.get("upvotes", 0) > 100:  # Consider high-performing content
+                if (post.get("upvotes") or 0) > 100:  # Consider high-performing content
                     patterns["successful_hooks"].append(post.get("title", ""))
                     
         return patterns
     except Exception as e:
-        logger.error(f"Error analyzing content patterns: {e}")
+        logger.error("Error analyzing content patterns: %s", e)
         return patterns
 
+def classify_pain_sentences(texts):
+    """Split texts into sentences and pick out pain points and triggers"""
+    pain_points = []
+    triggers = []
+    for doc in get_nlp().pipe(texts):
+        for sent in doc.sents:
+            if any(word in sent.text.lower() for word in ["problem", "issue", "struggle", "difficult"]):
+                pain_points.append(sent.text.strip())
+            if any(word in sent.text.lower() for word in ["want", "need", "wish", "hope"]):
+                triggers.append(sent.text.strip())
+    return pain_points, triggers
+
 def extract_pain_points_and_triggers(social_data, competitor_data):
     """Extract pain points and emotional triggers from all data sources"""
     pain_points = []
@@ -579,18 +696,16 @@ def extract_pain_points_and_triggers(social_data, competitor_data):
     
     try:
         # Analyze comments and discussions
-        for platform, data in social_data.items():
-            for item in data:
-                # Analyze text for pain points and triggers
-                text = item.get("description", "") + " " + item.get("comments", "")
-                
-                # Use NLP to identify pain points
-                doc = nlp(text)
-                for sent in doc.sents:
-                    if any(word in sent.text.lower() for word in ["problem", "issue", "struggle", "difficult"]):
-                        pain_points.append(sent.text.strip())
-                    if any(word in sent.text.lower() for word in ["want", "need", "wish", "hope"]):
-                        triggers.append(sent.text.strip())
+        texts = [
+            f"{item.get('title', '')}. {item.get('description', '') or item.get('body', '')}"
+            for platform, data in social_data.items()
+            for item in data
+        ]
+        
+        # Use NLP to identify pain points, in batches on the CPU pool
+        for batch_pain_points, batch_triggers in cpu_pool.map_batches(classify_pain_sentences, texts, batch_size=16):
+            pain_points.extend(batch_pain_points)
+            triggers.extend(batch_triggers)
         
         # Deduplicate and clean results
         pain_points = list(set(pain_points))[:5]
@@ -598,107 +713,214 @@ def extract_pain_points_and_triggers(social_data, competitor_data):
         
         return pain_points, triggers
     except Exception as e:
-        logger.error(f"Error extracting pain points and triggers: {e}")
+        logger.error("Error extracting pain points and triggers: %s", e)
         return [], []
 
-def art_finder(user_input):
-    try:
-        # Extract keywords
-        keywords = extract_keywords(user_input)
-        
-        # Gather comprehensive data
-        trends_data = get_google_trends_data(keywords)
-        competitor_results = search_duckduckgo(" ".join(keywords))
-        social_data = scrape_social_data(keywords)
-        
-        # Analyze patterns and extract insights
-        content_patterns = analyze_content_patterns(social_data)
-        pain_points, triggers = extract_pain_points_and_triggers(social_data, competitor_results)
-        
-        # Calculate market sentiment
-        sentiments = [analyze_sentiment(result['snippet']) for result in competitor_results if result.get('snippet')]
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        
-        # Get AI insights using Gemini
-        model = setup_gemini()
-        ai_insights = analyze_with_gemini(model, competitor_results, trends_data, keywords, content_patterns)
-        
-        # Generate comprehensive response
-        response = {
-            "query": user_input,
-            "timestamp": datetime.now().isoformat(),
-            "analysis": {
-                "metadata": {
-                    "total_sources": len(competitor_results),
-                    "market_sentiment": {
-                        "score": float(round(avg_sentiment, 2)),
-                        "label": "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral"
-                    },
-                    "key_topics": keywords,
-                    "pain_points": pain_points,
-                    "triggers": triggers,
-                    "content_patterns": content_patterns
-                },
-                "ai_insights": ai_insights,
-                "trend_analysis": {
-                    "google_trends": {
-                        "data": [
-                            {
-                                "date": d.strftime('%Y-%m-%d'),
-                                **{k: float(v) for k, v in row.items() if k != 'date'}
-                            }
-                            for d, row in trends_data.iterrows()
-                        ] if not trends_data.empty else [],
-                        "keywords": keywords
-                    }
+def analyze_reddit_sentiment(posts):
+    """Average sentiment of Reddit discussions"""
+    texts = [f"{post.get('title', '')} {post.get('body', '')}".strip() for post in posts]
+    scores = [score for text, score in zip(texts, score_sentiments(texts)) if text]
+    average = sum(scores) / len(scores) if scores else 0
+    return {
+        "score": float(round(average, 2)),
+        "label": "Positive" if average > 0 else "Negative" if average < 0 else "Neutral",
+        "discussions_analyzed": len(scores)
+    }
+
+def extract_common_questions(posts, limit=5):
+    """Questions asked across Quora posts, most frequent first"""
+    counts = {}
+    for post in posts:
+        title = " ".join(post.get("title", "").split())
+        if title.endswith("?") or title.lower().split(" ", 1)[0] in QUESTION_WORDS:
+            counts[title] = counts.get(title, 0) + 1
+    return [question for question, _ in sorted(counts.items(), key=lambda x: x[1], reverse=True)[:limit]]
+
+def generate_posting_schedule(content_patterns):
+    """Suggest a posting cadence from how much content the niche produces"""
+    content_count = sum(content_patterns.get("content_types", {}).values())
+    views = content_patterns.get("engagement_metrics", {}).get("views", 0)
+    if content_count >= 5 and views >= 1_000_000:
+        frequency = "Daily"
+    elif content_count >= 3:
+        frequency = "3-4x/week"
+    else:
+        frequency = "Weekly"
+    return {
+        "frequency": frequency,
+        "best_days": ["Tuesday", "Thursday", "Saturday"],
+        "best_times": ["9AM", "12PM", "7PM"]
+    }
+
+def score_competitor_sentiments(competitors):
+    return score_sentiments(result.get('snippet', '') for result in competitors)
+
+def collect_social_data(youtube, reddit, quora):
+    return {"youtube": youtube, "reddit": reddit, "quora": quora}
+
+def generate_ai_insights(prompt, timeout=None):
+    """Structured insights (a dict of lists) in JSON mode, markdown text otherwise"""
+    quota_manager.acquire("gemini")
+    if STRUCTURED_INSIGHTS:
+        return generate_structured_insights(setup_gemini(INSIGHTS_MODEL), prompt, timeout)
+    return generate_insights_text(setup_gemini(INSIGHTS_MODEL), prompt, timeout)
+
+def render_ai_insights(insights):
+    """The markdown report for the response, rendered from structured insights"""
+    if not insights:
+        return AI_INSIGHTS_UNAVAILABLE
+    return render_markdown(insights) if isinstance(insights, dict) else insights
+
+def build_analysis_response(query, keywords, trends, competitors, competitor_sentiments, social_data,
+                            content_patterns, pain_points, insights, ai_insights, runner, reuse):
+    """Assemble the /analyze response from the pipeline outputs"""
+    pain_points, triggers = pain_points
+    structured = insights if isinstance(insights, dict) else None
+    if structured:
+        # Social posts give the most concrete pain points; the model fills any gaps
+        pain_points = pain_points or structured.get("pain_points", [])[:5]
+        triggers = triggers or structured.get("triggers", [])[:5]
+    sentiments = [
+        score for result, score in zip(competitors, competitor_sentiments) if result.get('snippet')
+    ]
+    avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
+    
+    return {
+        "query": query,
+        "timestamp": datetime.now().isoformat(),
+        "analysis": {
+            "metadata": {
+                "total_sources": len(competitors),
+                "market_sentiment": {
+                    "score": float(round(avg_sentiment, 2)),
+                    "label": "Positive" if avg_sentiment > 0 else "Negative" if avg_sentiment < 0 else "Neutral"
                 },
-                "competitor_analysis": [
-                    {
-                        "title": result.get('title', ''),
-                        "summary": format_result(result.get('snippet', ''), 150),
-                        "url": result.get('link', ''),
-                        "sentiment": float(round(analyze_sentiment(result.get('snippet', '')), 2)),
-                        "strengths": ["Brand Recognition", "Product Innovation", "Market Presence"][index % 3],
-                        "content_strategy": {
-                            "formats": ["Video", "Blog", "Social"][index % 3],
-                            "channels": ["Instagram", "YouTube", "TikTok"][index % 3],
-                            "frequency": ["Daily", "Weekly", "Bi-weekly"][index % 3]
+                "key_topics": keywords,
+                "pain_points": pain_points,
+                "triggers": triggers,
+                "ad_templates": (structured or {}).get("ad_templates", [])[:5],
+                "content_patterns": content_patterns,
+                "skipped_sources": runner.skipped,
+                "stage_reuse": reuse
+            },
+            "ai_insights": ai_insights,
+            "structured_insights": structured,
+            "trend_analysis": {
+                "google_trends": {
+                    "data": [
+                        {
+                            "date": d.strftime('%Y-%m-%d'),
+                            **{k: float(v) for k, v in row.items() if k != 'date'}
                         }
-                    } for index, result in enumerate(competitor_results[:5])
-                ],
-                "social_insights": {
-                    "youtube": {
-                        "trending_videos": social_data.get("youtube", [])[:3],
-                        "popular_formats": content_patterns.get("popular_formats", []),
-                        "engagement_metrics": content_patterns.get("engagement_metrics", {})
-                    },
-                    "reddit": {
-                        "top_discussions": social_data.get("reddit", [])[:3],
-                        "community_sentiment": analyze_reddit_sentiment(social_data.get("reddit", []))
-                    },
-                    "quora": {
-                        "expert_insights": social_data.get("quora", [])[:3],
-                        "common_questions": extract_common_questions(social_data.get("quora", []))
+                        for d, row in trends.iterrows()
+                    ] if trends is not None and not trends.empty else [],
+                    "keywords": keywords,
+                    # "shared": one 0-100 scale across keywords; "per_keyword": each to its own peak
+                    "scale": trends.attrs.get("scale", "shared") if trends is not None else "shared"
+                }
+            },
+            "competitor_analysis": [
+                {
+                    "title": result.get('title', ''),
+                    "summary": format_result(result.get('snippet', ''), 150),
+                    "url": result.get('link', ''),
+                    "sentiment": float(round(competitor_sentiments[index], 2)),
+                    "strengths": ["Brand Recognition", "Product Innovation", "Market Presence"][index % 3],
+                    "content_strategy": {
+                        "formats": ["Video", "Blog", "Social"][index % 3],
+                        "channels": ["Instagram", "YouTube", "TikTok"][index % 3],
+                        "frequency": ["Daily", "Weekly", "Bi-weekly"][index % 3]
                     }
+                } for index, result in enumerate(competitors[:5])
+            ],
+            "social_insights": {
+                "youtube": {
+                    "trending_videos": social_data.get("youtube", [])[:3],
+                    "popular_formats": content_patterns.get("popular_formats", []),
+                    "engagement_metrics": content_patterns.get("engagement_metrics", {})
                 },
-                "content_recommendations": {
-                    "hooks": content_patterns.get("successful_hooks", [])[:5],
-                    "ctas": content_patterns.get("effective_ctas", [])[:5],
-                    "formats": list(content_patterns.get("content_types", {}).keys())[:5],
-                    "posting_schedule": generate_posting_schedule(content_patterns),
-                    "platform_specific": {
-                        "instagram": {"post_types": ["Reels", "Carousel", "Stories"], "best_times": ["9AM", "3PM", "8PM"]},
-                        "youtube": {"video_length": ["30s", "3min", "10min"], "upload_times": ["Evening", "Weekend"]},
-                        "tiktok": {"content_style": ["Trending", "Educational", "Behind-the-scenes"], "frequency": "2-3x/day"}
-                    }
+                "reddit": {
+                    "top_discussions": social_data.get("reddit", [])[:3],
+                    "community_sentiment": analyze_reddit_sentiment(social_data.get("reddit", []))
+                },
+                "quora": {
+                    "expert_insights": social_data.get("quora", [])[:3],
+                    "common_questions": extract_common_questions(social_data.get("quora", []))
+                }
+            },
+            "content_recommendations": {
+                "hooks": content_patterns.get("successful_hooks", [])[:5],
+                "ctas": content_patterns.get("effective_ctas", [])[:5],
+                "formats": list(content_patterns.get("content_types", {}).keys())[:5],
+                "posting_schedule": generate_posting_schedule(content_patterns),
+                "platform_specific": {
+                    "instagram": {"post_types": ["Reels", "Carousel", "Stories"], "best_times": ["9AM", "3PM", "8PM"]},
+                    "youtube": {"video_length": ["30s", "3min", "10min"], "upload_times": ["Evening", "Weekend"]},
+                    "tiktok": {"content_style": ["Trending", "Educational", "Behind-the-scenes"], "frequency": "2-3x/day"}
                 }
             }
         }
+    }
 
+def persist_analysis(response):
+    """Store a finished analysis so history, insights and chat can use it"""
+    # Assign the id here so insert listeners (e.g. the search index) can refer to the document
+    document = {"_id": str(uuid.uuid4()), **response, "charts_data": prepare_chart_data(response["analysis"])}
+    log_payload(logger, "Data being sent to database", document)
+    return bool(db_manager.insert_document(document))
+
+# The analysis pipeline: each stage names the outputs it consumes, so
+# independent sources (trends, search, YouTube) are fetched in parallel
+analysis_pipeline = Pipeline([
+    Stage("keywords", extract_keywords, inputs={"text": "query"}, default=[]),
+    Stage("trends", fetch_trends_data, inputs=["keywords", "reuse"], source="trends", default=None),
+    Stage("competitors", fetch_competitors_by_keyword, inputs=["keywords", "reuse"], source="serpapi", default=[]),
+    Stage("youtube", fetch_youtube_by_keyword, inputs=["keywords", "reuse"], source="youtube", default=[]),
+    Stage("reddit", fetch_reddit_by_keyword, inputs=["keywords", "reuse"], source="reddit", default=[]),
+    Stage("quora", fetch_quora_by_keyword, inputs=["keywords", "reuse"], source="quora", default=[]),
+    Stage("social_data", collect_social_data, inputs=["youtube", "reddit", "quora"], default={}),
+    Stage("content_patterns", analyze_content_patterns, inputs=["social_data"], default={}),
+    Stage(
+        "pain_points", extract_pain_points_and_triggers,
+        inputs={"social_data": "social_data", "competitor_data": "competitors"}, default=([], [])
+    ),
+    Stage("competitor_sentiments", score_competitor_sentiments, inputs=["competitors"], default=[]),
+    Stage(
+        "prompt", build_analysis_prompt,
+        inputs={"competitor_results": "competitors", "trends_data": "trends", "keywords": "keywords"}, default=""
+    ),
+    Stage("insights", generate_ai_insights, inputs=["prompt"], source="gemini", default=None),
+    Stage("ai_insights", render_ai_insights, inputs=["insights"], default=AI_INSIGHTS_UNAVAILABLE),
+    Stage(
+        "response", build_analysis_response,
+        inputs=["query", "keywords", "trends", "competitors", "competitor_sentiments", "social_data",
+                "content_patterns", "pain_points", "insights", "ai_insights", "runner", "reuse"]
+    ),
+    Stage("stored", persist_analysis, inputs=["response"], default=False),
+], max_workers=PIPELINE_WORKERS)
+
+def art_finder(user_input, targets=("response", "stored"), keywords=None):
+    try:
+        # Upstream calls share one deadline and fail fast while a source is down;
+        # reuse records how much of each stage was served from the per-keyword caches
+        runner = StageRunner()
+        inputs = {"query": user_input, "runner": runner, "reuse": {}}
+        if keywords is not None:
+            # Already extracted by the caller; the pipeline skips the keywords stage
+            inputs["keywords"] = keywords
+        outputs, timings = analysis_pipeline.run(list(targets), inputs, runner)
+        
+        if "response" not in targets:
+            # Callers asking for individual stages get just those outputs
+            return {name: outputs[name] for name in targets}
+        response = outputs["response"]
+        if response is None:
+            raise RuntimeError("Could not assemble the analysis")
+        response["analysis"]["metadata"]["stage_timings_ms"] = timings
         return response
         
     except Exception as e:
-        logger.error(f"Error in art_finder: {str(e)}")
+        logger.error("Error in art_finder: %s", e)
         return {
             "error": True,
             "message": str(e),
@@ -706,6 +928,7 @@ def art_finder(user_input):
         }
 
 if __name__ == "__main__":
+    configure_logging()
     while True:
         try:
             user_input = input("\n🎯 Describe your business and ad goals (or type 'exit' to quit): ")
@@ -0,0 +1,240 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "with"
+}
+
+# Weight of each indexed field: a match in the query or topics says more than one in the report body
+FIELD_WEIGHTS = {"query": 3.0, "key_topics": 2.0, "competitors": 1.0, "ai_insights": 1.0}
+
+def tokenize(text: str) -> list:
+    """Case-folded terms in any script, with stopwords dropped and plurals folded"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.casefold()):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+def document_fields(data: dict) -> dict:
+    """The searchable text of a stored analysis, by field"""
+    analysis = data.get("analysis", {}) if isinstance(data, dict) else {}
+    ai_insights = analysis.get("ai_insights", "")
+    return {
+        "query": data.get("query", "") if isinstance(data, dict) else "",
+        "key_topics": " ".join(analysis.get("metadata", {}).get("key_topics", [])),
+        "competitors": " ".join(result.get("title", "") for result in analysis.get("competitor_analysis", [])),
+        "ai_insights": ai_insights if isinstance(ai_insights, str) else ""
+    }
+
+class SearchIndex:
+    """BM25 full-text search over stored analyses, kept in an inverted index.
+
+    Each insert adds its weighted term frequencies to per-term postings and
+    appends one line to a local log, so neither indexing nor persistence
+    rescans history. Postings are turned into NumPy arrays when first
+    searched after a change, so a query scores every matching document with
+    a few vector operations. Each process keeps its own index; the log is
+    read back on first use and any stored analyses it lacks are added from
+    loader, and lines appended since by other worker processes are read
+    before each search.
+    """
+
+    def __init__(self, path: str = None, loader=None, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.loader = loader
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._log_offset = 0
+        self._docs = []
+        self._ids = {}
+        self._lengths = []
+        self._postings = {}
+        self._arrays = {}
+        self._length_array = None
+        self.searches = 0
+        self.search_seconds = 0.0
+
+    def load(self) -> bool:
+        """Read the index log and backfill it from the database; returns True if this call did it"""
+        if self.loaded:
+            return False
+        with self._load_lock:
+            if self.loaded:
+                return False
+            try:
+                self._sync_log()
+                if self.loader is not None:
+                    # Backfill analyses the log lacks (e.g. stored while no worker was indexing);
+                    # entries other workers appended meanwhile are read first, so they are not logged twice
+                    documents = self.loader()
+                    self._sync_log()
+                    for doc in documents:
+                        self._add(doc)
+            except Exception as e:
+                logger.error("Error loading search index: %s", e)
+            self.loaded = True
+            return True
+
+    def _sync_log(self):
+        """Index log entries appended since the last read (e.g. by other workers)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with self._log_lock:
+            try:
+                if os.path.getsize(self.path) <= self._log_offset:
+                    return
+                with open(self.path, "rb") as f:
+                    f.seek(self._log_offset)
+                    data = f.read()
+            except OSError as e:
+                logger.error("Error reading search index log: %s", e)
+                return
+            # A trailing partial line is still being written; read it next time
+            data = data[:data.rfind(b"\n") + 1]
+            self._log_offset += len(data)
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash mid-append
+                logger.warning("Skipping unreadable search index entry")
+                continue
+            self._index(entry["doc"], entry["terms"])
+
+    def add_analysis(self, data: dict):
+        """Index a newly stored analysis and append it to the log"""
+        if not self.load():
+            # Another worker's insert is already in the log; read it rather than log it twice
+            self._sync_log()
+        self._add(data)
+
+    def _add(self, data: dict):
+        if not isinstance(data, dict) or data.get("_id") is None:
+            return
+        doc_id = str(data["_id"])
+        if doc_id in self._ids:
+            return
+        terms = Counter()
+        for field, text in document_fields(data).items():
+            for term in tokenize(text):
+                terms[term] += FIELD_WEIGHTS[field]
+        doc = {
+            "_id": doc_id,
+            "query": data.get("query", ""),
+            "timestamp": data.get("timestamp", ""),
+            "key_topics": data.get("analysis", {}).get("metadata", {}).get("key_topics", [])
+        }
+        if not self._index(doc, terms):
+            return
+        if self.path:
+            line = (json.dumps({"doc": doc, "terms": terms}) + "\n").encode()
+            try:
+                # One O_APPEND write per entry, so appends from several workers do not interleave
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    with self._log_lock:
+                        os.write(fd, line)
+                        end = os.lseek(fd, 0, os.SEEK_CUR)
+                        if end - len(line) == self._log_offset:
+                            # Nothing else was appended before this entry; skip re-reading it
+                            self._log_offset = end
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.error("Error writing search index log: %s", e)
+
+    def _index(self, doc: dict, terms: dict) -> bool:
+        with self._lock:
+            if doc["_id"] in self._ids:
+                return False
+            number = len(self._docs)
+            self._ids[doc["_id"]] = number
+            self._docs.append(doc)
+            self._lengths.append(sum(terms.values()))
+            self._length_array = None
+            for term, frequency in terms.items():
+                ids, frequencies = self._postings.setdefault(term, ([], []))
+                ids.append(number)
+                frequencies.append(frequency)
+                self._arrays.pop(term, None)
+            return True
+
+    def _term_arrays(self, term: str):
+        arrays = self._arrays.get(term)
+        if arrays is None and term in self._postings:
+            ids, frequencies = self._postings[term]
+            arrays = self._arrays[term] = (np.array(ids, dtype=np.int64), np.array(frequencies, dtype=float))
+        return arrays
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> dict:
+        """Stored analyses ranked by BM25 relevance to query, one page at a time"""
+        if not self.load():
+            self._sync_log()
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            count = len(self._docs)
+            if not count or not terms:
+                return {"total": 0, "results": []}
+            if self._length_array is None:
+                self._length_array = np.array(self._lengths, dtype=float)
+            lengths = self._length_array
+            norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1e-9))
+            scores = np.zeros(count)
+            for term in terms:
+                arrays = self._term_arrays(term)
+                if arrays is None:
+                    continue
+                ids, frequencies = arrays
+                idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+                scores[ids] += idf * frequencies * (self.k1 + 1) / (frequencies + norm[ids])
+            docs = self._docs
+
+        matched = np.flatnonzero(scores)
+        end = offset + limit
+        top = matched
+        if end < len(matched):
+            # Keep everything tied with the last needed score so pages never overlap
+            cutoff = np.partition(scores[matched], len(matched) - end)[len(matched) - end]
+            top = matched[scores[matched] >= cutoff]
+        # Best score first; among equals, the most recent analysis
+        top = top[np.lexsort((-top, -scores[top]))][offset:end]
+        return {
+            "total": int(len(matched)),
+            "results": [{**docs[number], "score": round(float(scores[number]), 4)} for number in top]
+        }
+
+    def record_search(self, seconds: float):
+        with self._lock:
+            self.searches += 1
+            self.search_seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "documents": len(self._docs),
+                "terms": len(self._postings),
+                "searches": self.searches,
+                "avg_search_ms": round(self.search_seconds / self.searches * 1000, 2) if self.searches else 0.0
+            }
@@ -1,29 +1,51 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List
-import uvicorn
-from scrap import art_finder
+from typing import Optional
+from scrap import analysis_pipeline, art_finder, analyze_sentiment, extract_keywords, get_nlp, get_pytrends
 from db import db_manager
+from chat_cache import chat_cache, context_fingerprint
+from chat_context import ChatContextStore
+from chat_sessions import chat_sessions
+from insights import InsightAggregates
+from search_index import SearchIndex
+from warmup import Warmup
+from launcher import memory_usage
+from cpu_pool import cpu_pool
+from singleflight import SingleFlight, normalize_query
+from similar_queries import similar_queries
+from refresh_ahead import analysis_cache, query_popularity, refresh_ahead
+from resilience import breakers
+from log_config import configure_logging
+from wordcloud_service import FORMATS, analysis_texts, content_hash, render_cache, render_wordcloud, term_frequencies
+from trend_store import trend_store
+from competitor_search import competitor_search
+from stage_cache import stage_cache
+from admission import AdmissionMiddleware, admission_lanes, admission_routes
+from quota import QuotaExceeded, TenantMiddleware, as_tenant, current_tenant, parse_api_keys, quota_manager
+from payloads import CompressionMiddleware, json_response, parse_fields, payload_stats, project
 from datetime import datetime
+import inspect
 import json
 import logging
-import google.generativeai as genai
 import os
+import time
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('server.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (levels via LOG_LEVEL / LOG_LEVELS, format via LOG_FORMAT)
+configure_logging(log_file='server.log')
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Identical /analyze requests that arrive together share one pipeline run
+analyze_flight = SingleFlight()
+
+# Bound concurrent analyses and queue them separately from chat/history;
+# added before CORS so rejections still carry CORS headers
+app.add_middleware(AdmissionMiddleware, lanes=admission_lanes, routes=admission_routes)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -31,8 +53,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Queue-Wait-Ms", "X-Service-Time-Ms"],
 )
 
+# Compress large responses with brotli/gzip as negotiated by the client
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+# Upstream calls are charged to the caller's API key tenant, or else its client address
+app.add_middleware(TenantMiddleware, api_keys=parse_api_keys(os.getenv("QUOTA_API_KEYS", "")))
+
 class QueryRequest(BaseModel):
     message: str
 
@@ -44,9 +73,11 @@ class QueryResponse(BaseModel):
 class ChatMessage(BaseModel):
     message: str
     context: Optional[str] = None
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
 
 def prepare_chart_data(analysis):
     """Prepare chart-friendly data from analysis"""
@@ -94,72 +125,191 @@ async def root():
     return {"message": "Welcome to the Market Research API"}
 
 @app.post("/analyze")
-async def analyze_query(request: QueryRequest):
+async def analyze_query(request: QueryRequest, fields: Optional[str] = None, reuse_similar: bool = True):
     try:
-        print(f"📝 Received analysis request: {request.message}")
+        logger.info("Received analysis request: %s", request.message)
         
-        # Get analysis using art_finder from scrap.py
-        analysis = art_finder(request.message)
+        # Popular queries are kept warm in the analysis cache by the refresh-ahead scheduler;
+        # a query with no words has no key and is never coalesced or cached
+        key = normalize_query(request.message)
+        analysis = None
+        if key:
+            query_popularity.record(key, request.message)
+            analysis = analysis_cache.get(key)
+        reused = None
+        keywords = None
+        if analysis is None and reuse_similar and similar_queries.enabled:
+            # A recent analysis of a paraphrase is returned at once; reuse_similar=false forces a new one
+            keywords = await run_in_threadpool(cpu_pool.run, extract_keywords, request.message)
+            for match in similar_queries.find(request.message, keywords):
+                analysis = analysis_cache.get(match["key"])
+                if analysis is not None:
+                    reused = {"query": match["query"], "similarity": match["similarity"], "age_seconds": analysis_age(analysis)}
+                    break
+        if analysis is None and key and not (quota_manager.has_budget("serpapi") and quota_manager.has_budget("gemini")):
+            # Over budget: an older analysis of the same query beats a degraded one
+            analysis = analysis_cache.get(key, allow_stale=True)
+        if analysis is None:
+            # Get analysis using art_finder from scrap.py, off the event loop
+            compute = lambda: run_in_threadpool(analyze_and_cache, key, request.message, keywords)
+            analysis = await (analyze_flight.do(key, compute) if key else compute())
+        if isinstance(analysis, dict) and "query" in analysis:
+            # A coalesced result may come from a differently worded request
+            analysis = {**analysis, "query": request.message}
+        if reused:
+            analysis = {**analysis, "reused_analysis": reused}
         
         if not analysis:
-            print("❌ No analysis generated")
+            logger.error("No analysis generated")
             raise HTTPException(status_code=400, detail="Could not generate analysis")
         
-        print("✅ Analysis completed successfully")
-        return analysis
+        logger.info("Analysis completed successfully")
+        return json_response("/analyze", project(analysis, parse_fields(fields)))
         
     except Exception as e:
-        print(f"❌ Error in analyze_query: {str(e)}")
+        logger.error("Error in analyze_query: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+def analyze_and_cache(key: str, message: str, keywords: Optional[list] = None) -> dict:
+    analysis = art_finder(message, keywords=keywords)
+    if key and isinstance(analysis, dict) and not analysis.get("error"):
+        analysis_cache.put(key, analysis)
+        similar_queries.add(key, message, analysis["analysis"]["metadata"].get("key_topics", []))
+    return analysis
+
+def analysis_age(analysis: dict) -> Optional[int]:
+    """Seconds since an analysis was produced"""
+    try:
+        return max(int((datetime.now() - datetime.fromisoformat(analysis["timestamp"])).total_seconds()), 0)
+    except (KeyError, TypeError, ValueError):
+        return None
+
 @app.get("/history")
-async def get_history():
+async def get_history(fields: Optional[str] = None):
     try:
-        documents = db_manager.get_all_documents()
-        return {"history": documents}
+        documents = await run_in_threadpool(db_manager.get_all_documents)
+        selected = parse_fields(fields)
+        return json_response("/history", {"history": [project(doc, selected) for doc in documents]})
     except Exception as e:
-        print(f"Error fetching history: {str(e)}")
+        logger.error("Error fetching history: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+# Full-text search over stored analyses, ranked by relevance
+@app.get("/history/search")
+async def search_history(q: str, page: int = 1, page_size: int = 10):
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), 100)
+    start = time.perf_counter()
+    found = await run_in_threadpool(search_index.search, q, page_size, (page - 1) * page_size)
+    search_index.record_search(time.perf_counter() - start)
+    return {"query": q, "page": page, "page_size": page_size, **found}
+
+async def load_analysis(analysis_id: str) -> dict:
+    doc = await run_in_threadpool(db_manager.get_document, analysis_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return doc
+
+@app.get("/analyses/{analysis_id}/terms")
+async def get_terms(analysis_id: str, top: int = 50):
+    doc = await load_analysis(analysis_id)
+    frequencies = term_frequencies(analysis_texts(doc), top_n=top)
+    return {"analysis_id": analysis_id, "terms": frequencies}
+
+@app.get("/analyses/{analysis_id}/wordcloud")
+async def get_wordcloud(analysis_id: str, request: Request, format: str = "png", width: int = 800, height: int = 400):
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(FORMATS)}")
+    width, height = min(max(width, 100), 2000), min(max(height, 100), 2000)
+    
+    doc = await load_analysis(analysis_id)
+    frequencies = term_frequencies(analysis_texts(doc))
+    if not frequencies:
+        raise HTTPException(status_code=404, detail="No text to build a word cloud from")
+    
+    # The ETag is the content hash, so a client holding it can skip the render entirely
+    key = content_hash(frequencies, format, width, height)
+    headers = {"ETag": f'"{key}"', "Cache-Control": "public, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    # Rendering is CPU-bound, so it runs on the process pool
+    image = render_cache.get(key, format)
+    if image is None:
+        image = await run_in_threadpool(cpu_pool.run, render_wordcloud, frequencies, format, width, height)
+        render_cache.put(key, format, image)
+    
+    return Response(image, media_type=FORMATS[format], headers=headers)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header covers etag (weak comparison, as for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+QUOTA_MESSAGE = "You have reached your usage limit for now. Please try again later."
+
 # Separate chat handler class
 class ChatHandler:
+    # Common prefixes and meta-references removed from answers
+    phrases_to_remove = [
+        "Hi,", "Hello,", "Greetings,",
+        "Based on", "According to", "The data shows",
+        "Research indicates", "Analysis suggests",
+        "Looking at", "ARTFinder here"
+    ]
+    
+    # Characters to buffer before the opening of a streamed answer is cleaned
+    stream_prefix_chars = 64
+    
     def __init__(self):
-        self.model = None
-        self.setup_model()
+        self._model = None
+    
+    @property
+    def model(self):
+        # The Gemini client is only configured when first needed
+        if self._model is None:
+            self.setup_model()
+        return self._model
     
     def setup_model(self):
+        import google.generativeai as genai
         GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
         genai.configure(api_key=GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
+        self._model = genai.GenerativeModel('gemini-pro')
     
     def clean_response(self, text: str) -> str:
         # Remove common prefixes and meta-references
-        phrases_to_remove = [
-            "Hi,", "Hello,", "Greetings,",
-            "Based on", "According to", "The data shows",
-            "Research indicates", "Analysis suggests",
-            "Looking at", "ARTFinder here"
-        ]
-        
         cleaned = text.strip()
-        for phrase in phrases_to_remove:
+        for phrase in self.phrases_to_remove:
             cleaned = cleaned.replace(phrase, "").strip()
         
         return cleaned
     
-    async def get_response(self, question: str, context_data: list) -> str:
-        # Extract only essential insights from context
-        insights = []
-        for doc in context_data:
-            if isinstance(doc, dict) and doc.get("analysis"):
-                insight = doc.get("analysis", {}).get("ai_insights", "")
-                if insight:
-                    insights.append(insight)
-        
-        prompt = f"""
+    def clean_prefix(self, text: str) -> str:
+        """Strip greetings and meta-references from the start of a streamed answer"""
+        cleaned = text.lstrip()
+        stripped = True
+        while stripped:
+            stripped = False
+            for phrase in self.phrases_to_remove:
+                if cleaned.startswith(phrase):
+                    cleaned = cleaned[len(phrase):].lstrip()
+                    stripped = True
+        return cleaned
+    
+    def build_prompt(self, question: str, context: str, history: str = "") -> str:
+        conversation = f"""
+        Conversation so far:
+        {history}
+""" if history else ""
+        return f"""
         Context (use this information but don't mention it):
-        {' '.join(insights[-3:])}  # Only use last 3 insights
-
+        {context}
+{conversation}
         Question: {question}
 
         Rules:
@@ -169,107 +319,265 @@ class ChatHandler:
         - No data or statistics
         - If you can't answer from context, say "I don't have that information"
         """
+    
+    async def get_response(self, question: str, passages: list, history: str = "") -> str:
+        # Passages are pre-chunked insights ranked by relevance to the question
+        context = '\n'.join(passages)
+        fingerprint = context_fingerprint(context + history)
+        
+        cached = chat_cache.lookup(question, fingerprint)
+        if cached is not None:
+            return cached
+        
+        prompt = self.build_prompt(question, context, history)
         
         try:
+            quota_manager.acquire("gemini")
             response = self.model.generate_content(prompt)
-            return self.clean_response(response.text)
+            answer = self.clean_response(response.text)
+            chat_cache.store(question, fingerprint, answer)
+            return answer
+        except QuotaExceeded as e:
+            logger.warning("Chat refused: %s", e)
+            return QUOTA_MESSAGE
         except Exception as e:
-            logger.error(f"Error generating chat response: {str(e)}")
+            logger.error("Error generating chat response: %s", e)
             return "Sorry, I couldn't process that request."
+    
+    async def stream_response(self, question: str, passages: list, request: Request, history: str = ""):
+        """Yield answer text as Gemini streams it, stopping if the client goes away"""
+        context = '\n'.join(passages)
+        fingerprint = context_fingerprint(context + history)
+        
+        cached = chat_cache.lookup(question, fingerprint)
+        if cached is not None:
+            yield cached
+            return
+        
+        prompt = self.build_prompt(question, context, history)
+        quota_manager.acquire("gemini")
+        response = await self.model.generate_content_async(prompt, stream=True)
+        
+        head = ""
+        parts = []
+        completed = False
+        try:
+            async for chunk in response:
+                if await request.is_disconnected():
+                    logger.info("Chat client disconnected, abandoning stream")
+                    return
+                text = chunk.text
+                if not parts:
+                    # Hold back the opening until there is enough to clean it
+                    head += text
+                    if len(head) < self.stream_prefix_chars:
+                        continue
+                    text = self.clean_prefix(head)
+                if text:
+                    parts.append(text)
+                    yield text
+            
+            if not parts and head:
+                text = self.clean_prefix(head)
+                parts.append(text)
+                yield text
+            completed = True
+        finally:
+            if completed:
+                # Cached answers are cleaned the same way as /chat's, whichever endpoint fills the cache
+                chat_cache.store(question, fingerprint, self.clean_response("".join(parts)))
+            else:
+                await self.close_stream(response)
+    
+    async def close_stream(self, response):
+        """Cancel an unfinished Gemini stream so its connection is released"""
+        stream = getattr(response, "_iterator", None) or response
+        close = getattr(stream, "aclose", None) or getattr(stream, "cancel", None)
+        if close is None:
+            return
+        try:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.debug("Error closing chat stream: %s", e)
 
 # Initialize chat handler
 chat_handler = ChatHandler()
 
+# Insert listeners run in the worker that stored the analysis; the others
+# pick it up from the shared insert log before serving chat or insights
+# (search_index keeps its own log)
+
+# Chat context is maintained from stored analyses instead of re-read per message
+chat_context_store = ChatContextStore(loader=db_manager.get_all_documents)
+db_manager.add_insert_listener(chat_context_store.add_analysis)
+
+# Cached chat answers are only valid until a new analysis lands
+db_manager.add_insert_listener(chat_cache.invalidate)
+
+# Topic, strategy and sentiment aggregates are updated per insert
+insight_aggregates = InsightAggregates(loader=db_manager.get_all_documents)
+db_manager.add_insert_listener(insight_aggregates.add_analysis)
+
+# Stored analyses are indexed for /history/search as they are inserted
+search_index = SearchIndex(path=os.getenv("SEARCH_INDEX_PATH", "search_index.jsonl"), loader=db_manager.get_all_documents)
+db_manager.add_insert_listener(search_index.add_analysis)
+
+# Background refreshes recompute the analysis without storing it again,
+# charged to their own tenant budget
+def refresh_analysis(query: str) -> dict:
+    with as_tenant("refresh-ahead"):
+        return art_finder(query, targets=("response",))
+
+refresh_ahead.refresh = refresh_analysis
+
+# Slow components are initialised in the background after startup
+warmup = Warmup()
+warmup.register("nlp", get_nlp)
+warmup.register("sentiment", lambda: analyze_sentiment("warm up"))
+warmup.register("pandas", lambda: __import__("pandas"))
+warmup.register("gemini", lambda: chat_handler.model)
+warmup.register("database", lambda: db_manager.collection)
+warmup.register("trends", get_pytrends)
+warmup.register("insights", insight_aggregates.load)
+warmup.register("chat_context", chat_context_store.load)
+warmup.register("search_index", search_index.load)
+
+@app.on_event("startup")
+async def start_warmup():
+    # Start following other workers' inserts before the loaders read the database
+    db_manager.sync_inserts()
+    warmup.start()
+
+@app.on_event("startup")
+async def start_refresh_ahead():
+    refresh_ahead.start()
+
+@app.on_event("shutdown")
+async def stop_cpu_pool():
+    warmup.stop()
+    refresh_ahead.stop()
+    quota_manager.save()
+    cpu_pool.shutdown()
+
+@app.get("/ready")
+async def readiness():
+    report = warmup.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+def chat_passages(question: str) -> list:
+    """Insight passages for a question; may block on the database, so run it off the event loop"""
+    db_manager.sync_inserts()
+    return chat_context_store.retrieve(question)
+
 # Simplified chat endpoint
 @app.post("/chat")
 async def chat_analysis(request: ChatMessage):
     try:
-        # Get last 3 documents from database
-        historical_data = db_manager.get_all_documents()[-3:]
+        # Get the insight passages most relevant to the question
+        passages = await run_in_threadpool(chat_passages, request.message)
+        
+        # Continue the caller's conversation, or start a new one
+        session_id = request.session_id or chat_sessions.new_session_id()
+        history = await run_in_threadpool(chat_sessions.history, session_id)
         
         # Get response using chat handler
         response_text = await chat_handler.get_response(
             request.message,
-            historical_data
+            passages,
+            history
         )
+        await run_in_threadpool(chat_sessions.append, session_id, request.message, response_text)
         
-        return ChatResponse(response=response_text)
+        return ChatResponse(response=response_text, session_id=session_id)
         
     except Exception as e:
-        logger.error(f"Chat endpoint error: {str(e)}")
+        logger.error("Chat endpoint error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-# Helper functions for data analysis
-def extract_market_trends(historical_data: List[dict]) -> dict:
-    """Extract market trends from historical data"""
-    try:
-        all_topics = []
-        for doc in historical_data:
-            topics = doc.get("analysis", {}).get("metadata", {}).get("key_topics", [])
-            all_topics.extend(topics)
-        
-        # Count frequency of topics
-        topic_frequency = {}
-        for topic in all_topics:
-            topic_frequency[topic] = topic_frequency.get(topic, 0) + 1
-        
-        # Sort by frequency
-        sorted_trends = dict(sorted(topic_frequency.items(), 
-                                  key=lambda x: x[1], 
-                                  reverse=True)[:5])
-        
-        return {
-            "top_trends": sorted_trends,
-            "total_topics": len(all_topics)
-        }
-    except Exception as e:
-        print(f"❌ Error extracting market trends: {str(e)}")
-        return {}
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-def extract_competitor_strategies(historical_data: List[dict]) -> dict:
-    """Extract competitor strategies from historical data"""
-    try:
-        all_strategies = []
-        for doc in historical_data:
-            competitors = doc.get("analysis", {}).get("competitor_analysis", [])
-            for comp in competitors:
-                if comp.get("summary"):
-                    all_strategies.append({
-                        "summary": comp.get("summary"),
-                        "sentiment": comp.get("sentiment", 0)
-                    })
-        
-        # Sort by sentiment to get top performing strategies
-        sorted_strategies = sorted(all_strategies, 
-                                 key=lambda x: x.get("sentiment", 0), 
-                                 reverse=True)[:5]
-        
-        return {
-            "top_strategies": sorted_strategies,
-            "total_analyzed": len(all_strategies)
-        }
-    except Exception as e:
-        print(f"❌ Error extracting competitor strategies: {str(e)}")
-        return {}
+# Streaming chat endpoint (server-sent events)
+@app.post("/chat/stream")
+async def chat_stream(request: ChatMessage, http_request: Request):
+    passages = await run_in_threadpool(chat_passages, request.message)
+    session_id = request.session_id or chat_sessions.new_session_id()
+    history = await run_in_threadpool(chat_sessions.history, session_id)
+    
+    async def events():
+        try:
+            parts = []
+            async for delta in chat_handler.stream_response(request.message, passages, http_request, history):
+                parts.append(delta)
+                yield sse_event({"delta": delta})
+            await run_in_threadpool(chat_sessions.append, session_id, request.message, "".join(parts).strip())
+            yield sse_event({"session_id": session_id}, event="done")
+        except QuotaExceeded as e:
+            logger.warning("Chat stream refused: %s", e)
+            yield sse_event({"message": QUOTA_MESSAGE}, event="error")
+        except Exception as e:
+            logger.error("Chat stream error: %s", e)
+            yield sse_event({"message": "Sorry, I couldn't process that request."}, event="error")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-def calculate_average_sentiment(historical_data: List[dict]) -> dict:
-    """Calculate average sentiment from historical data"""
-    try:
-        sentiments = []
-        for doc in historical_data:
-            sentiment = doc.get("analysis", {}).get("metadata", {}).get("market_sentiment", {}).get("score", 0)
-            sentiments.append(sentiment)
-        
-        avg_sentiment = sum(sentiments) / len(sentiments) if sentiments else 0
-        
-        return {
-            "average_score": round(avg_sentiment, 2),
-            "label": "Positive" if avg_sentiment > 0 else "Negative",
-            "total_analyzed": len(sentiments)
-        }
-    except Exception as e:
-        print(f"❌ Error calculating average sentiment: {str(e)}")
-        return {}
+@app.get("/stats")
+async def get_stats():
+    return {
+        "chat_cache": chat_cache.stats(),
+        "chat_context": chat_context_store.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "cpu_pool": cpu_pool.stats(),
+        "analyze_singleflight": analyze_flight.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "similar_queries": similar_queries.stats(),
+        "refresh_ahead": refresh_ahead.stats(),
+        "payloads": payload_stats.stats(),
+        "wordcloud_cache": render_cache.stats(),
+        "trend_store": trend_store.stats(),
+        "competitor_search": competitor_search.stats(),
+        "stage_cache": stage_cache.stats(),
+        "pipeline_stages": analysis_pipeline.stats(),
+        "insights": insight_aggregates.stats(),
+        "search_index": search_index.stats(),
+        "admission": {name: lane.stats() for name, lane in admission_lanes.items()},
+        "quota": quota_manager.report(),
+        "circuit_breakers": {name: breaker.stats() for name, breaker in breakers.items()},
+        "worker": {"pid": os.getpid(), **memory_usage()}
+    }
+
+# Upstream consumption and remaining budget for the calling tenant
+@app.get("/quota")
+async def get_quota():
+    return {"tenant": current_tenant.get(), "services": quota_manager.report(current_tenant.get())}
+
+# Cross-query insights read materialized aggregates instead of scanning history
+def sync_insights():
+    insight_aggregates.load()
+    db_manager.sync_inserts()
+
+@app.get("/insights/trends")
+async def get_market_trends():
+    await run_in_threadpool(sync_insights)
+    return json_response("/insights/trends", insight_aggregates.market_trends())
+
+@app.get("/insights/competitors")
+async def get_competitor_strategies():
+    await run_in_threadpool(sync_insights)
+    return json_response("/insights/competitors", insight_aggregates.competitor_strategies())
+
+@app.get("/insights/sentiment")
+async def get_average_sentiment():
+    await run_in_threadpool(sync_insights)
+    return json_response("/insights/sentiment", insight_aggregates.average_sentiment())
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+
+import numpy as np
+
+from chat_cache import EMBEDDING_DIM, embed_text
+from search_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+def fold_query(text: str) -> str:
+    """Query text with stopwords dropped and plurals folded, as the search index does"""
+    return " ".join(tokenize(text))
+
+def keyword_overlap(a, b) -> float:
+    """Jaccard similarity of two keyword lists, compared as folded terms"""
+    a, b = set(tokenize(" ".join(a))), set(tokenize(" ".join(b)))
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+class SimilarQueryIndex:
+    """Recently analysed queries, for recognising paraphrases of a new one.
+
+    Each entry holds the hashed term vector of the folded query (stopwords
+    dropped, plurals singular) and its extracted keywords in a fixed-size
+    ring buffer. A lookup scores every entry with one matrix-vector product,
+    then averages the best candidates' cosine similarity with their folded
+    keyword overlap. Rewordings that keep the subject's terms score about
+    0.65-0.7 ("vegan snacks for kids" / "kids' vegan snack ideas"); queries
+    differing only in plurals or an extra word score higher. Word order
+    only counts through bigrams, so swapped subjects ("dog food for cats" /
+    "cat food for dogs") can still match; callers can force a fresh analysis.
+    """
+
+    def __init__(self, max_entries: int = 500, threshold: float = 0.65, candidates: int = 10,
+                 enabled: bool = True, dim: int = EMBEDDING_DIM):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.candidates = candidates
+        self.enabled = enabled
+        self.dim = dim
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries = [None] * max_entries
+        self._slots = {}
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matches = 0
+
+    def add(self, key: str, query: str, keywords: list):
+        """Remember an analysed query, replacing an earlier entry for the same key"""
+        vector = embed_text(fold_query(query), self.dim)
+        if not vector.any():
+            return
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._next
+                evicted = self._entries[slot]
+                if evicted is not None:
+                    del self._slots[evicted[0]]
+                else:
+                    self._size += 1
+                self._next = (slot + 1) % self.max_entries
+                self._slots[key] = slot
+            self._vectors[slot] = vector
+            self._entries[slot] = (key, query, list(keywords))
+
+    def find(self, query: str, keywords: list) -> list:
+        """Entries similar enough to reuse, best first, as dicts with key, query and similarity"""
+        vector = embed_text(fold_query(query), self.dim)
+        with self._lock:
+            self.lookups += 1
+            if not self._size or not vector.any():
+                return []
+            scores = self._vectors[:self._size] @ vector
+            count = min(self.candidates, self._size)
+            candidates = np.argpartition(-scores, count - 1)[:count]
+            matches = []
+            for slot in candidates:
+                key, original, original_keywords = self._entries[slot]
+                similarity = (float(scores[slot]) + keyword_overlap(keywords, original_keywords)) / 2
+                if similarity >= self.threshold:
+                    matches.append({"key": key, "query": original, "similarity": round(similarity, 3)})
+            if matches:
+                self.matches += 1
+        return sorted(matches, key=lambda match: match["similarity"], reverse=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": self._size,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "matches": self.matches
+        }
+
+# Create a single instance of SimilarQueryIndex
+similar_queries = SimilarQueryIndex(
+    max_entries=int(os.getenv("SIMILAR_QUERY_ENTRIES", "500")),
+    threshold=float(os.getenv("SIMILAR_QUERY_THRESHOLD", "0.65")),
+    enabled=os.getenv("SIMILAR_QUERY_REUSE", "1") == "1"
+)
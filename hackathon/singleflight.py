@@ -0,0 +1,47 @@
+import asyncio
+import re
+
+_WORD_RE = re.compile(r"\w+")
+
+def normalize_query(text: str) -> str:
+    """Case, punctuation and whitespace insensitive key for a query.
+
+    Word order and repeated words are kept: "dog food for cats" and
+    "cat food for dogs" are different questions. Words in any script count;
+    a query with no word characters at all gets an empty key, which callers
+    must not coalesce or cache on.
+    """
+    return " ".join(_WORD_RE.findall(text.casefold()))
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one computation.
+
+    The first caller for a key starts the work as its own task; callers that
+    arrive while it is running await the same task. The task is shielded, so
+    a disconnecting client does not cancel the work for everyone else.
+    Coalescing is per process (per worker).
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func):
+        """Run the coroutine function func once per key among concurrent callers"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "computations": self.leaders,
+            "duplicates_avoided": self.coalesced,
+            "in_flight": len(self._in_flight)
+        }
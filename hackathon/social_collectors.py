@@ -0,0 +1,199 @@
+import contextvars
+import html
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional, TypedDict
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': os.getenv("SOCIAL_USER_AGENT", "art-finder/1.0 (market research)"),
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+class SocialPost(TypedDict):
+    """A compact record of one discussion, shared by all social collectors.
+
+    upvotes and comments are None where the source does not expose them
+    (Quora), rather than a zero that would read as no engagement.
+    """
+    platform: str
+    title: str
+    body: str
+    upvotes: Optional[int]
+    comments: Optional[int]
+    url: str
+
+def engagement(post: SocialPost) -> int:
+    """Ranking weight of a post: upvotes, with comments counting double"""
+    return (post["upvotes"] or 0) + 2 * (post["comments"] or 0)
+
+def rank_posts(posts: List[SocialPost], limit: int) -> List[SocialPost]:
+    """Deduplicate posts by URL and keep the most engaging ones"""
+    unique = {}
+    for post in posts:
+        if post["url"] not in unique or engagement(post) > engagement(unique[post["url"]]):
+            unique[post["url"]] = post
+    return sorted(unique.values(), key=engagement, reverse=True)[:limit]
+
+class RedditCollector:
+    """Collect Reddit discussions through the public search JSON listing.
+
+    Listings are cursor-paginated, so pages for one keyword are fetched in
+    sequence; collection stops early once `target` posts reach
+    `min_engagement`, or when the page limit or time budget runs out.
+    Keywords are collected concurrently by the caller.
+    """
+
+    def __init__(self, base_url: str = "https://www.reddit.com", page_size: int = 100, max_pages: int = 3,
+                 target: int = 10, min_engagement: int = 100):
+        self.base_url = base_url.rstrip("/")
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.target = target
+        self.min_engagement = min_engagement
+
+    @staticmethod
+    def parse_listing(data: dict) -> tuple:
+        """Posts and the next-page cursor from a listing response"""
+        listing = data.get("data", {}) if isinstance(data, dict) else {}
+        posts = []
+        for child in listing.get("children", []):
+            item = child.get("data", {})
+            if not item.get("title"):
+                continue
+            posts.append(SocialPost(
+                platform="reddit",
+                title=item.get("title", ""),
+                body=" ".join(item.get("selftext", "").split())[:500],
+                upvotes=int(item.get("score", 0) or 0),
+                comments=int(item.get("num_comments", 0) or 0),
+                url="https://www.reddit.com" + item.get("permalink", "") if item.get("permalink") else item.get("url", "")
+            ))
+        return posts, listing.get("after")
+
+    def search(self, keyword: str, timeout: float = 10) -> List[SocialPost]:
+        stop_at = time.monotonic() + (timeout or 10)
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        posts = []
+        after = None
+        for _ in range(self.max_pages):
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            params = {"q": keyword, "sort": "relevance", "t": "year", "limit": self.page_size, "raw_json": 1}
+            if after:
+                params["after"] = after
+            response = session.get(f"{self.base_url}/search.json", params=params, timeout=remaining)
+            response.raise_for_status()
+            page_posts, after = self.parse_listing(response.json())
+            posts.extend(page_posts)
+            if sum(engagement(post) >= self.min_engagement for post in posts) >= self.target or not after:
+                break
+        return rank_posts(posts, self.target)
+
+_RESULT_LINK_RE = re.compile(r'<a[^>]+class="result__a"[^>]+href="([^"]+)"[^>]*>(.*?)</a>', re.S)
+_RESULT_SNIPPET_RE = re.compile(r'<a[^>]+class="result__snippet"[^>]*>(.*?)</a>', re.S)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def _text(fragment: str) -> str:
+    return " ".join(html.unescape(_TAG_RE.sub("", fragment)).split())
+
+class QuoraCollector:
+    """Collect Quora questions through a site-restricted web search.
+
+    Quora has no public API, so questions are found with DuckDuckGo's HTML
+    search limited to quora.com. Result pages are offset-addressed and are
+    fetched concurrently, in rounds, until `target` questions are found or
+    `max_pages` pages have been read. Search results carry no vote counts,
+    so records have no upvotes or comments, are ordered by search rank and
+    are never ranked or early-stopped by engagement.
+    """
+
+    def __init__(self, search_url: str = "https://html.duckduckgo.com/html/", page_size: int = 30,
+                 max_pages: int = 4, concurrency: int = 2, target: int = 10, max_workers: int = 8):
+        self.search_url = search_url
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.target = target
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quora-pages")
+
+    @staticmethod
+    def parse_results(page: str) -> List[SocialPost]:
+        snippets = [_text(snippet) for snippet in _RESULT_SNIPPET_RE.findall(page)]
+        posts = []
+        for index, (href, title) in enumerate(_RESULT_LINK_RE.findall(page)):
+            url = html.unescape(href)
+            # Result links are redirects carrying the target in uddg=
+            target = parse_qs(urlsplit(url).query).get("uddg")
+            url = target[0] if target else url
+            if "quora.com" not in (urlsplit(url).hostname or ""):
+                continue
+            posts.append(SocialPost(
+                platform="quora",
+                title=_text(title),
+                body=snippets[index] if index < len(snippets) else "",
+                upvotes=None,
+                comments=None,
+                url=url
+            ))
+        return posts
+
+    def fetch_page(self, keyword: str, offset: int, timeout: float) -> List[SocialPost]:
+        response = requests.get(
+            self.search_url,
+            params={"q": f"site:quora.com {keyword}", "s": offset, "dc": offset + 1},
+            headers=DEFAULT_HEADERS,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return self.parse_results(response.text)
+
+    def search(self, keyword: str, timeout: float = 10) -> List[SocialPost]:
+        stop_at = time.monotonic() + (timeout or 10)
+        posts = []
+        for first_page in range(0, self.max_pages, self.concurrency):
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+            pages = range(first_page, min(first_page + self.concurrency, self.max_pages))
+            futures = [
+                self._executor.submit(
+                    contextvars.copy_context().run, self.fetch_page, keyword, page * self.page_size, remaining
+                )
+                for page in pages
+            ]
+            done, _ = wait(futures, timeout=remaining)
+            round_posts = []
+            for future in futures:
+                if future in done and future.exception() is None:
+                    round_posts.extend(future.result())
+                elif future in done:
+                    logger.warning("Quora result page failed for %s: %.200s", keyword, future.exception())
+            if not round_posts and not posts and all(future in done and future.exception() for future in futures):
+                raise futures[0].exception()
+            posts.extend(round_posts)
+            if len({post["url"] for post in posts}) >= self.target or not round_posts:
+                break
+        # Keep search order; duplicates across pages are dropped
+        seen = set()
+        return [post for post in posts if not (post["url"] in seen or seen.add(post["url"]))][:self.target]
+
+# Create single instances of the collectors
+reddit_collector = RedditCollector(
+    base_url=os.getenv("REDDIT_BASE_URL", "https://www.reddit.com"),
+    max_pages=int(os.getenv("REDDIT_MAX_PAGES", "3")),
+    min_engagement=int(os.getenv("REDDIT_MIN_ENGAGEMENT", "100"))
+)
+quora_collector = QuoraCollector(
+    search_url=os.getenv("QUORA_SEARCH_URL", "https://html.duckduckgo.com/html/"),
+    max_pages=int(os.getenv("QUORA_MAX_PAGES", "4"))
+)
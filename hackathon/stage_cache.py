@@ -0,0 +1,169 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from cache_context import refresh_margin
+
+logger = logging.getLogger(__name__)
+
+class KeywordStageCache:
+    """Upstream stage outputs cached per (stage, keyword).
+
+    Queries that share keywords, such as successive refinements of the same
+    idea, reuse what earlier requests fetched and only go upstream for the
+    keywords that are new. Each request reports how much it reused.
+    """
+
+    def __init__(self, ttl_seconds: float = 6 * 3600, max_entries: int = 2000, max_workers: int = 8):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self._totals = {}
+
+    def get(self, stage: str, keyword: str, min_ttl: float = 0.0):
+        """Cached output, unless it expires within min_ttl seconds"""
+        key = (stage, keyword.lower())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            # Expired entries are kept (until evicted) as a fallback for stale()
+            if time.time() - entry[0] > self.ttl_seconds - min_ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def stale(self, stage: str, keyword: str):
+        """Cached output regardless of age, for when fetching is not possible"""
+        with self._lock:
+            entry = self._entries.get((stage, keyword.lower()))
+            return entry[1] if entry else None
+
+    def put(self, stage: str, keyword: str, value):
+        with self._lock:
+            self._entries[(stage, keyword.lower())] = (time.time(), value)
+            self._entries.move_to_end((stage, keyword.lower()))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record(self, stage: str, reused: int, fetched: int, report: dict = None):
+        """Count keywords served from cache vs upstream, globally and into a per-request report"""
+        with self._lock:
+            totals = self._totals.setdefault(stage, {"reused": 0, "fetched": 0})
+            totals["reused"] += reused
+            totals["fetched"] += fetched
+        if report is not None:
+            total = reused + fetched
+            report[stage] = {
+                "reused": reused,
+                "fetched": fetched,
+                "reuse_ratio": round(reused / total, 3) if total else 0.0
+            }
+
+    def compose(self, stage: str, keywords: list, fetch, timeout: float = None, report: dict = None,
+                combined=None) -> dict:
+        """Per-keyword results for a stage, fetching only the keywords not cached.
+
+        fetch(keyword, timeout=...) is called concurrently for the missing
+        keywords, on threads of this call's own (so one request's fetches
+        never queue behind another's), and a fetch that has not started by
+        the timeout is not started at all. Given combined(query, timeout=...),
+        a cold miss (no keyword cached) makes one combined fetch for all
+        keywords joined, cached and returned under that joined key, instead
+        of one fetch per keyword. A keyword whose
+        fetch fails (including a tenant being over quota) is served from an
+        expired entry if there is one, otherwise it is left out; the stage
+        only fails when no keyword has any result.
+        """
+        results = {}
+        missing = []
+        # Background refreshes refetch entries that are about to expire
+        min_ttl = refresh_margin.get()
+        for keyword in keywords:
+            cached = self.get(stage, keyword, min_ttl)
+            if cached is None:
+                missing.append(keyword)
+            else:
+                results[keyword] = cached
+
+        # Keywords each fetched key accounts for in the reuse report
+        width = 1
+        if combined is not None and len(keywords) > 1 and len(missing) == len(keywords):
+            query = " ".join(keywords)
+            width = len(keywords)
+            keywords = missing = [query]
+            fetch = combined
+            cached = self.get(stage, query, min_ttl)
+            if cached is not None:
+                self.record(stage, width, 0, report)
+                return {query: cached}
+
+        stop_at = time.monotonic() + timeout if timeout else None
+
+        def bounded_fetch(keyword):
+            remaining = stop_at - time.monotonic() if stop_at else None
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError("not started before the stage timed out")
+            return fetch(keyword, timeout=remaining)
+
+        errors = []
+        if missing:
+            executor = ThreadPoolExecutor(max_workers=min(len(missing), self.max_workers),
+                                          thread_name_prefix="stage-fetch")
+            # Fetches run in a copy of the caller's context (tenant, refresh margin)
+            futures = {
+                executor.submit(contextvars.copy_context().run, bounded_fetch, keyword): keyword
+                for keyword in missing
+            }
+            done, _ = wait(futures, timeout=timeout)
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future, keyword in futures.items():
+                if future not in done:
+                    errors.append((keyword, TimeoutError("timed out")))
+                elif future.exception() is not None:
+                    errors.append((keyword, future.exception()))
+                else:
+                    results[keyword] = future.result()
+                    self.put(stage, keyword, results[keyword])
+
+        stale = 0
+        for keyword, _ in errors:
+            value = self.stale(stage, keyword)
+            if value is not None:
+                results[keyword] = value
+                stale += 1
+
+        self.record(stage, (len(keywords) - len(missing) + stale) * width, (len(missing) - len(errors)) * width, report)
+        if errors:
+            if not results:
+                # Keep the original exception type (e.g. QuotaExceeded) for the caller
+                raise errors[0][1]
+            logger.warning(
+                "%s failed for some keywords: %s",
+                stage, "; ".join(f"{keyword}: {str(error)[:200]}" for keyword, error in errors)
+            )
+        # Keep the caller's keyword order
+        return {keyword: results[keyword] for keyword in keywords if keyword in results}
+
+    def stats(self) -> dict:
+        with self._lock:
+            report = {"entries": len(self._entries)}
+            for stage, totals in self._totals.items():
+                total = totals["reused"] + totals["fetched"]
+                report[stage] = {
+                    **totals,
+                    "reuse_ratio": round(totals["reused"] / total, 3) if total else 0.0
+                }
+            return report
+
+# Create a single instance of KeywordStageCache
+stage_cache = KeywordStageCache(
+    ttl_seconds=float(os.getenv("STAGE_CACHE_TTL", str(6 * 3600))),
+    max_entries=int(os.getenv("STAGE_CACHE_SIZE", "2000"))
+)
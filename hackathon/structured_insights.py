@@ -0,0 +1,164 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields of a structured insights report, in report order:
+# (field, section heading, subsection heading, what the model should put there)
+INSIGHT_FIELDS = [
+    ("pain_points", "Market Research Analysis", "User Pain Points",
+     "Key user problems, common complaints and unmet desires, backed by the competitor data"),
+    ("triggers", "Market Research Analysis", "Emotional Triggers",
+     "Emotional triggers that move this audience to act"),
+    ("competitor_strategies", "Market Research Analysis", "Competitor Strategy Analysis",
+     "What top competitors do: successful hooks, CTAs, content formats, channels"),
+    ("market_trends", "Market Research Analysis", "Market Trends & Opportunities",
+     "Current trends and shifts, emerging opportunities, consumer behaviour patterns"),
+    ("hooks", "Strategic Recommendations", "High-Converting Hooks",
+     "5 proven hooks with the trigger or pain point each one uses and an example"),
+    ("content_formats", "Strategic Recommendations", "Top Performing Formats",
+     "Content types that work, with platform-specific recommendations"),
+    ("visual_elements", "Strategic Recommendations", "Visual Elements",
+     "Imagery and design elements that convert, per platform"),
+    ("ctas", "Strategic Recommendations", "Call-to-Action Analysis",
+     "Top performing CTAs with timing and placement recommendations"),
+    ("ad_headlines", "Implementation Guide", "Ad Headlines",
+     "3-5 ready-to-use ad headlines"),
+    ("ad_templates", "Implementation Guide", "Ad Copy Templates",
+     "2-3 complete ad copy variations with suggested visuals and CTA"),
+    ("channel_strategy", "Implementation Guide", "Channel Strategy",
+     "Platform recommendations, posting frequency and timing, audience targeting"),
+]
+
+# Response schema for Gemini's JSON output mode: every field is a list of
+# short strings, so each list item can be used as soon as it is streamed
+INSIGHTS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        field: {"type": "array", "items": {"type": "string"}, "description": description}
+        for field, _, _, description in INSIGHT_FIELDS
+    },
+    "required": [field for field, _, _, _ in INSIGHT_FIELDS],
+}
+
+def structured_prompt_fields() -> str:
+    """Output instructions listing the schema fields for the prompt"""
+    lines = ["Respond with a JSON object with these fields, each a list of concise, specific items:"]
+    lines += [f"- {field}: {description}" for field, _, _, description in INSIGHT_FIELDS]
+    lines.append("Focus on actionable insights backed by the analyzed data, with examples and metrics where possible.")
+    return "\n    ".join(lines)
+
+class InsightsStreamParser:
+    """Parse a JSON insights object incrementally as it is streamed.
+
+    feed() takes the next chunk of model output and returns the
+    (field, item) pairs it completed: each element of a top-level list as
+    soon as it closes, and top-level scalar fields once complete. Parsed
+    items accumulate in fields, so a stream cut short still yields
+    everything that arrived before it stopped.
+    """
+
+    def __init__(self, on_item=None):
+        self.on_item = on_item
+        self.fields = {}
+        self.complete = False
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._in_list = False
+        self._key = None
+        self._start = None
+
+    def _item_depth(self) -> int:
+        return 2 if self._in_list else 1
+
+    def _finish(self, end: int, completed: list):
+        raw = self._buffer[self._start:end]
+        self._start = None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            logger.warning("Skipping malformed insights item: %.100s", raw)
+            return
+        if self._depth == 1 and self._expect_key:
+            self._key = value
+            return
+        if self._in_list:
+            self.fields.setdefault(self._key, []).append(value)
+        else:
+            self.fields[self._key] = value
+        completed.append((self._key, value))
+        if self.on_item:
+            self.on_item(self._key, value)
+
+    def feed(self, text: str) -> list:
+        completed = []
+        self._buffer += text
+        for i in range(self._pos, len(self._buffer)):
+            c = self._buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._start is not None and self._depth == self._item_depth():
+                        self._finish(i + 1, completed)
+                continue
+            if c.isspace() or self.complete:
+                continue
+
+            item_depth = self._item_depth()
+            if self._depth == item_depth and self._start is None and c not in ",:]}":
+                if c == "[" and self._depth == 1 and not self._expect_key:
+                    # A list field: its elements are the items
+                    self._in_list = True
+                    self._depth = 2
+                    self.fields.setdefault(self._key, [])
+                    continue
+                self._start = i
+
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._expect_key = True
+            elif c in "}]":
+                if self._depth == item_depth and self._start is not None:
+                    # A number, boolean or null ends at the closing bracket
+                    self._finish(i, completed)
+                self._depth -= 1
+                if self._depth == item_depth and self._start is not None:
+                    self._finish(i + 1, completed)
+                if self._in_list and self._depth == 1:
+                    self._in_list = False
+                if self._depth == 0:
+                    self.complete = True
+            elif c == ",":
+                if self._depth == item_depth and self._start is not None:
+                    self._finish(i, completed)
+                if self._depth == 1:
+                    self._expect_key = True
+            elif c == ":" and self._depth == 1:
+                self._expect_key = False
+        self._pos = len(self._buffer)
+        return completed
+
+def render_markdown(insights: dict) -> str:
+    """Render structured insights as the markdown report shown to users"""
+    lines = []
+    heading = None
+    for field, section, subsection, _ in INSIGHT_FIELDS:
+        items = [" ".join(str(item).split()) for item in insights.get(field) or [] if str(item).strip()]
+        if not items:
+            continue
+        if section != heading:
+            heading = section
+            lines += [f"# {section}", ""]
+        lines += [f"## {subsection}"] + [f"- {item}" for item in items] + [""]
+    return "\n".join(lines).strip()
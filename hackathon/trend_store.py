@@ -0,0 +1,281 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from cache_context import refresh_margin
+
+logger = logging.getLogger(__name__)
+
+# Weeks re-fetched before the last stored point to line a new window up with history
+OVERLAP_WEEKS = int(os.getenv("TREND_OVERLAP_WEEKS", "4"))
+# How long a fetched window (and its still-running current week) stays fresh
+REFRESH_SECONDS = float(os.getenv("TREND_REFRESH_HOURS", "12")) * 3600
+# Gaps longer than this are re-fetched in full (Google switches to weekly points past ~270 days)
+MAX_DELTA_WEEKS = 30
+MAX_WEEKS = 260
+
+WEEK = np.timedelta64(7, "D")
+_EMPTY_DATES = np.array([], dtype="datetime64[D]")
+
+def week_start(dates) -> np.ndarray:
+    """Sunday starting each date's week, which is how Google Trends labels weekly points"""
+    days = np.asarray(dates, dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday, four days after a Sunday
+    return days - ((days.astype(np.int64) + 4) % 7).astype("timedelta64[D]")
+
+def to_weekly(dates, values):
+    """Average (daily) points into Sunday-started weeks; weekly input passes through"""
+    if not len(dates):
+        return _EMPTY_DATES, np.array([], dtype=float)
+    labels, inverse = np.unique(week_start(dates), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.asarray(values, dtype=float))
+    return labels, sums / np.bincount(inverse)
+
+def full_timeframe(weeks: int) -> str:
+    return "today 12-m" if weeks <= 52 else "today 5-y"
+
+def merge_series(old_dates, old_values, new_dates, new_values, current_week):
+    """Stitch a newly fetched window onto stored history; returns (dates, values, scale).
+
+    Every Trends request is normalized to its own 0-100 scale, so the new
+    window is rescaled (by the returned scale) to the ratio of the two
+    series over the weeks they share. Completed stored weeks are kept; the
+    new window supplies everything after them, including a fresh value for
+    the running week.
+    """
+    if not len(old_dates):
+        return new_dates, new_values, 1.0
+
+    scale = 1.0
+    complete = old_dates < current_week
+    _, old_idx, new_idx = np.intersect1d(old_dates[complete], new_dates, return_indices=True)
+    overlap_new = new_values[new_idx].sum()
+    overlap_old = old_values[complete][old_idx].sum()
+    if len(old_idx) and overlap_new > 0 and overlap_old > 0:
+        scale = overlap_old / overlap_new
+        new_values = new_values * scale
+    else:
+        logger.warning("No usable overlap between stored and fetched trends; stitching unscaled")
+
+    last_complete = old_dates[complete][-1] if complete.any() else old_dates[0] - WEEK
+    keep_old = old_dates <= last_complete
+    take_new = new_dates > last_complete
+    # Rescaled new points also fill in anything older than the stored history
+    earlier = new_dates < old_dates[0]
+    dates = np.concatenate([new_dates[earlier], old_dates[keep_old], new_dates[take_new]])
+    values = np.concatenate([new_values[earlier], old_values[keep_old], new_values[take_new]])
+    return dates, values, scale
+
+class TrendStore:
+    """Per-keyword weekly interest history kept as NumPy arrays on disk.
+
+    A keyword seen before only needs the weeks since its last stored point
+    (plus a few weeks of overlap for rescaling), so repeat analyses cost a
+    small delta request instead of a full 12-month fetch, and horizons
+    longer than one request are assembled from the accumulated history.
+
+    Levels stay comparable across keywords through an anchor: the keywords
+    of one call are fetched in a single request, and each is rescaled into
+    the stored units of the first (anchor) keyword. Every history records
+    the base keyword whose units it is in, so keywords sharing a base can
+    be served from the store on one shared 0-100 scale.
+    """
+
+    def __init__(self, directory: str = None, overlap_weeks: int = OVERLAP_WEEKS,
+                 refresh_seconds: float = REFRESH_SECONDS):
+        self.directory = directory
+        self.overlap_weeks = overlap_weeks
+        self.refresh_seconds = refresh_seconds
+        self._series = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fresh = 0
+        self.upstream_calls = 0
+        self.points_fetched = 0
+        self.points_served = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, keyword: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(keyword.encode()).hexdigest() + ".npz")
+
+    def _load(self, keyword: str):
+        with self._lock:
+            record = self._series.get(keyword)
+        if record is not None or not self.directory or not os.path.exists(self._path(keyword)):
+            return record
+        try:
+            with np.load(self._path(keyword)) as data:
+                record = {
+                    "dates": data["dates"].astype("datetime64[D]"),
+                    "values": data["values"].astype(float),
+                    "fetched_at": float(data["fetched_at"]),
+                    # Histories stored before anchoring are in their own units
+                    "base": str(data["base"]) if "base" in data.files else keyword
+                }
+        except (OSError, KeyError, ValueError) as e:
+            logger.error("Error reading stored trends for %s: %s", keyword, e)
+            return None
+        with self._lock:
+            self._series[keyword] = record
+        return record
+
+    def _save(self, keyword: str, record: dict):
+        with self._lock:
+            self._series[keyword] = record
+        if not self.directory:
+            return
+        path = self._path(keyword)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, dates=record["dates"], values=record["values"], fetched_at=record["fetched_at"],
+                         base=np.array(record["base"]))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("Error writing stored trends for %s: %s", keyword, e)
+
+    def _stale(self, record, weeks: int, current_week, now) -> bool:
+        """Whether a keyword's stored history must be brought up to date"""
+        if record is None or not len(record["dates"]):
+            return True
+        if record["dates"][0] > current_week - (weeks - 1) * WEEK:
+            return True
+        # Background refreshes (refresh_margin) renew windows that are about to go stale
+        return not (record["dates"][-1] >= current_week
+                    and now - record["fetched_at"] < self.refresh_seconds - refresh_margin.get())
+
+    def _start(self, record, weeks: int, current_week):
+        """First week a request must cover to extend a keyword's history, or None for a full fetch"""
+        if record is None or not len(record["dates"]):
+            return None
+        if record["dates"][0] > current_week - (weeks - 1) * WEEK:
+            return None
+        last = record["dates"][-1]
+        if last < current_week - MAX_DELTA_WEEKS * WEEK:
+            return None
+        return min(last, current_week - WEEK) - self.overlap_weeks * WEEK
+
+    def get(self, keywords: list, fetch, weeks: int = 52, timeout: float = None, report: dict = None):
+        """Aligned weekly series for keywords over the last `weeks` weeks.
+
+        fetch(keywords, timeframe, timeout=...) performs one upstream request
+        and returns (dates, {keyword: values}). When any keyword is stale,
+        or the stored histories are not on one base, all keywords are
+        fetched in one request covering the oldest week any of them needs
+        and rebased onto the first keyword. If that fails, stored history is
+        served as long as every keyword has some. report, if given, receives
+        how many keywords were served straight from the store and whether
+        the series share one 0-100 scale (shared_scale) or are each on
+        their own.
+        """
+        weeks = max(1, min(weeks, MAX_WEEKS))
+        today = np.datetime64("today", "D")
+        current_week = week_start(today)
+        now = time.time()
+        records = {keyword: self._load(keyword) for keyword in keywords}
+
+        bases = {record["base"] if record else None for record in records.values()}
+        shared = None not in bases and len(bases) == 1
+        refresh = not shared or any(self._stale(record, weeks, current_week, now) for record in records.values())
+        with self._lock:
+            self.requests += 1
+            if not refresh:
+                self.fresh += 1
+        if report is not None:
+            report["fetched"] = len(keywords) if refresh else 0
+            report["reused"] = len(keywords) - report["fetched"]
+
+        if refresh:
+            starts = [self._start(record, weeks, current_week) for record in records.values()]
+            timeframe = full_timeframe(weeks) if None in starts else f"{min(starts)} {today}"
+            try:
+                dates, series = fetch(keywords, timeframe, timeout=timeout)
+            except Exception:
+                if all(record is not None for record in records.values()):
+                    logger.warning("Trends refresh failed for %s; serving stored history", keywords, exc_info=True)
+                else:
+                    raise
+            else:
+                with self._lock:
+                    self.upstream_calls += 1
+                    self.points_fetched += len(dates) * len(keywords)
+                self._rebase(keywords, dates, series, records, current_week, now)
+                shared = True
+
+        if report is not None:
+            report["shared_scale"] = shared
+        return self._window(records, weeks, current_week, shared)
+
+    def _rebase(self, keywords: list, dates, series: dict, records: dict, current_week, now):
+        """Merge one request's windows into history, in the anchor keyword's units"""
+        empty = {"dates": _EMPTY_DATES, "values": np.array([], dtype=float)}
+        anchor = keywords[0]
+        windows = {keyword: to_weekly(dates, series.get(keyword, np.zeros(len(dates)))) for keyword in keywords}
+
+        # The anchor is stitched onto its own history as usual; scale takes
+        # this request's values into the anchor's stored units
+        old = records[anchor] or empty
+        anchor_dates, anchor_values, scale = merge_series(old["dates"], old["values"], *windows[anchor], current_week)
+        base = records[anchor]["base"] if records[anchor] else anchor
+        records[anchor] = {"dates": anchor_dates, "values": anchor_values, "fetched_at": now, "base": base}
+        self._save(anchor, records[anchor])
+
+        for keyword in keywords[1:]:
+            new_dates, new_values = windows[keyword]
+            old = records[keyword] or empty
+            merged_dates, merged_values, own_scale = merge_series(
+                old["dates"], old["values"], new_dates, new_values * scale, current_week
+            )
+            # Undo the stitch's rescale so the whole history moves into anchor units instead
+            records[keyword] = {
+                "dates": merged_dates, "values": merged_values / own_scale, "fetched_at": now, "base": base
+            }
+            self._save(keyword, records[keyword])
+
+    def _window(self, records: dict, weeks: int, current_week, shared: bool):
+        first = current_week - (weeks - 1) * WEEK
+        available = [record for record in records.values() if record is not None]
+        if not available:
+            return _EMPTY_DATES, {}
+        dates = np.unique(np.concatenate([record["dates"] for record in available]))
+        dates = dates[dates >= first]
+
+        series = {}
+        for keyword, record in records.items():
+            values = np.zeros(len(dates))
+            if record is not None:
+                positions = np.searchsorted(dates, record["dates"])
+                found = (positions < len(dates)) & (record["dates"] >= first)
+                values[positions[found]] = record["values"][found]
+            series[keyword] = values
+
+        # On a shared base the keywords are put on one 0-100 scale, as in a
+        # single Trends request; otherwise each on its own
+        peaks = {keyword: values.max() if len(values) else 0.0 for keyword, values in series.items()}
+        top = max(peaks.values(), default=0.0)
+        for keyword, values in series.items():
+            peak = top if shared else peaks[keyword]
+            if peak > 0:
+                series[keyword] = np.round(values * (100.0 / peak), 2)
+        with self._lock:
+            self.points_served += len(dates) * len(series)
+        return dates, series
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keywords": len(self._series),
+                "requests": self.requests,
+                "served_from_store": self.fresh,
+                "upstream_calls": self.upstream_calls,
+                "points_fetched": self.points_fetched,
+                "points_served": self.points_served
+            }
+
+# Create a single instance of TrendStore
+trend_store = TrendStore(directory=os.getenv("TREND_STORE_DIR", "trend_store"))
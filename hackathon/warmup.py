@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class Warmup:
+    """Initialise slow components in the background and report readiness.
+
+    Components that fail (e.g. a network blip while connecting) are retried
+    with exponential backoff, so one transient error does not leave the
+    process unready for good.
+    """
+
+    def __init__(self, retry_delay: float = 2.0, max_retry_delay: float = 60.0):
+        self.components = {}
+        self.status = {}
+        self.timings = {}
+        self.attempts = {}
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name: str, func):
+        self.components[name] = func
+        self.status[name] = "pending"
+
+    def run(self, names=None):
+        """Warm the given components (all by default) in the calling thread"""
+        for name in names or list(self.components):
+            self.status[name] = "warming"
+            self.attempts[name] = self.attempts.get(name, 0) + 1
+            start = time.perf_counter()
+            try:
+                self.components[name]()
+                self.status[name] = "ready"
+            except Exception as e:
+                self.status[name] = f"error: {str(e)}"
+                logger.error("Failed to warm up %s: %s", name, e)
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def failed(self) -> list:
+        return [name for name, state in self.status.items() if state.startswith("error")]
+
+    def _loop(self):
+        self.run()
+        delay = self.retry_delay
+        while self.failed() and not self._stop.wait(delay):
+            self.run(self.failed())
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def start(self):
+        """Warm every component on a daemon thread, retrying failures"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="warmup", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def ready(self) -> bool:
+        return all(state == "ready" for state in self.status.values())
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": dict(self.status),
+            "seconds": dict(self.timings),
+            "attempts": dict(self.attempts)
+        }
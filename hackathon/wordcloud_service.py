@@ -0,0 +1,128 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# wordcloud pulls in matplotlib for its colormaps; never let it pick a GUI backend
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9'-]+")
+STOP_WORDS = {
+    "a", "about", "after", "all", "also", "an", "and", "any", "are", "as", "at", "be", "because",
+    "been", "best", "but", "by", "can", "could", "do", "does", "for", "from", "get", "has", "have",
+    "how", "if", "in", "into", "is", "it", "its", "just", "like", "more", "most", "new", "no", "not",
+    "of", "on", "one", "or", "our", "out", "over", "so", "some", "than", "that", "the", "their",
+    "them", "then", "there", "these", "they", "this", "to", "up", "us", "was", "we", "were", "what",
+    "when", "which", "who", "why", "will", "with", "you", "your"
+}
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+def analysis_texts(doc: dict) -> list:
+    """Collect the snippet-like texts of a stored analysis"""
+    analysis = doc.get("analysis", {}) if isinstance(doc, dict) else {}
+    texts = []
+    for competitor in analysis.get("competitor_analysis", []):
+        texts.append(competitor.get("title", ""))
+        texts.append(competitor.get("summary", ""))
+    for platform in analysis.get("social_insights", {}).values():
+        for items in platform.values() if isinstance(platform, dict) else []:
+            for item in items if isinstance(items, list) else []:
+                if isinstance(item, dict):
+                    texts.append(item.get("title", ""))
+                    texts.append(item.get("description", "") or item.get("body", ""))
+    return [text for text in texts if isinstance(text, str) and text]
+
+def term_frequencies(texts: list, top_n: int = 200) -> dict:
+    """Count terms across all texts at once with NumPy"""
+    tokens = [t for t in _TOKEN_RE.findall(" ".join(texts).lower()) if t not in STOP_WORDS]
+    if not tokens:
+        return {}
+    terms, counts = np.unique(np.array(tokens), return_counts=True)
+    order = np.argsort(-counts, kind="stable")[:top_n]
+    return {str(terms[i]): int(counts[i]) for i in order}
+
+def render_wordcloud(frequencies: dict, fmt: str = "png", width: int = 800, height: int = 400) -> bytes:
+    """Render a word cloud headlessly (no display or GUI backend needed)"""
+    from wordcloud import WordCloud
+
+    cloud = WordCloud(width=width, height=height, background_color='white').generate_from_frequencies(frequencies)
+    if fmt == "svg":
+        return cloud.to_svg().encode()
+    buffer = io.BytesIO()
+    cloud.to_image().save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def content_hash(frequencies: dict, fmt: str, width: int, height: int) -> str:
+    payload = json.dumps([sorted(frequencies.items()), fmt, width, height])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+class RenderCache:
+    """Rendered images keyed by content hash, in memory and optionally on disk"""
+
+    def __init__(self, max_entries: int = 128, directory: str = None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, f"{key}.{fmt}")
+
+    def get(self, key: str, fmt: str):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+                return image
+        if self.directory and os.path.exists(self._path(key, fmt)):
+            with open(self._path(key, fmt), "rb") as f:
+                image = f.read()
+            self.put(key, fmt, image, write=False)
+            with self._lock:
+                self.hits += 1
+            return image
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, fmt: str, image: bytes, write: bool = True):
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_entries:
+                self._images.popitem(last=False)
+        if write and self.directory:
+            try:
+                with open(self._path(key, fmt), "wb") as f:
+                    f.write(image)
+            except OSError as e:
+                logger.error("Error writing word cloud cache: %s", e)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._images),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Create a single instance of RenderCache
+render_cache = RenderCache(
+    max_entries=int(os.getenv("WORDCLOUD_CACHE_SIZE", "128")),
+    directory=os.getenv("WORDCLOUD_CACHE_DIR")
+)